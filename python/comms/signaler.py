@@ -5,6 +5,7 @@ Handles sending trading signals and system messages via ZeroMQ.
 
 import zmq
 import json
+import orjson
 import time
 import threading
 from typing import Optional, Dict, Any
@@ -20,14 +21,23 @@ import logging
 logging.basicConfig(level=logging.INFO)
 get_logger = lambda name: logging.getLogger(name)
 
+# Pre-encoded topic frames, one per message type
+TOPIC_FRAMES = {message_type.value: message_type.value.encode() for message_type in MessageType}
+
 
 class SignalPublisher:
     """ZMQ publisher for sending trading signals and system messages."""
     
-    def __init__(self, host: str = "localhost", port: int = 5555):
+    def __init__(self, host: str = "localhost", port: int = 5555,
+                 endpoint: Optional[str] = None, context: Optional[zmq.Context] = None,
+                 socket_type: int = zmq.PUB):
         self.host = host
         self.port = port
-        self.context = zmq.Context()
+        # endpoint overrides host/port, e.g. "inproc://..." with a shared context
+        self.endpoint = endpoint or f"tcp://{host}:{port}"
+        self.context = context or zmq.Context()
+        # PUB for the C++ engine's SUB; tests may use PUSH for lossless delivery
+        self.socket_type = socket_type
         self.socket = None
         self.logger = get_logger("SignalPublisher")
         self.is_connected = False
@@ -37,14 +47,19 @@ class SignalPublisher:
     def connect(self) -> bool:
         """Connect to ZMQ socket."""
         try:
-            self.socket = self.context.socket(zmq.PUB)
-            self.socket.bind(f"tcp://{self.host}:{self.port}")
+            self.socket = self.context.socket(self.socket_type)
+            # Room for signal bursts in the queue and the kernel buffer
+            self.socket.setsockopt(zmq.SNDHWM, 10000)
+            self.socket.setsockopt(zmq.SNDBUF, 1 << 20)
+            if self.endpoint.startswith("tcp://"):
+                self.socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
+            self.socket.bind(self.endpoint)
             
             # Allow time for socket to bind
             time.sleep(0.1)
             
             self.is_connected = True
-            self.logger.info(f"Connected to ZMQ publisher on {self.host}:{self.port}")
+            self.logger.info(f"Connected to ZMQ publisher on {self.endpoint}")
             
             # Start heartbeat thread
             self._start_heartbeat()
@@ -99,9 +114,26 @@ class SignalPublisher:
             return False
         
         try:
-            # Send topic and message
-            self.socket.send_string(topic, zmq.SNDMORE)
-            self.socket.send_json(message)
+            # orjson encodes straight to bytes; still JSON for the C++ parser.
+            # Strategy outputs are numpy scalars (np.float64), which stdlib json
+            # accepted as float subclasses but orjson only takes with this option.
+            payload = orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY)
+        except Exception as e:
+            self.logger.error(f"Failed to send message: {e}")
+            return False
+        
+        return self.send_encoded(topic, payload)
+    
+    def send_encoded(self, topic: str, payload: bytes) -> bool:
+        """Send an already-serialized JSON payload with the specified topic."""
+        if not self.is_connected or not self.socket:
+            self.logger.error("Not connected to ZMQ socket")
+            return False
+        
+        try:
+            # Both frames in one call; payloads under pyzmq's copy threshold are still copied
+            topic_frame = TOPIC_FRAMES.get(topic) or topic.encode()
+            self.socket.send_multipart([topic_frame, payload], copy=False)
             return True
             
         except Exception as e:
@@ -236,7 +268,7 @@ class SignalPublisher:
                 pair_name=pair_name
             )
             
-            message_dict = json.loads(error_msg.to_json())
+            message_dict = error_msg.to_dict()
             success = self._send_message("ERROR_MESSAGE", message_dict)
             
             if success:
@@ -9,12 +9,60 @@ from typing import Tuple, Optional, Dict, Any
 from pykalman import KalmanFilter
 import statsmodels.api as sm
 
+# numba is optional; without it the update step runs as plain Python
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 # Temporary logger for testing - will be replaced with proper logging
 import logging
 logging.basicConfig(level=logging.INFO)
 get_logger = lambda name: logging.getLogger(name)
 
 
+def _kf_step(x: np.ndarray, P: np.ndarray, log_price_b: float, transition_covariance: float,
+             observation_covariance: float, log_price_a: float) -> Tuple[np.ndarray, np.ndarray, float, float]:
+    """One predict/update of the [intercept, beta] state; returns (state, covariance, spread, forecast variance)."""
+    # Observation row is h = [1, log_price_b]; the 2x2 algebra is written out
+    # so it compiles to straight-line code
+    h1 = log_price_b
+    
+    # Prediction step: random-walk state, covariance grows by the transition noise
+    p00 = P[0, 0] + transition_covariance
+    p01 = P[0, 1]
+    p10 = P[1, 0]
+    p11 = P[1, 1] + transition_covariance
+    
+    # Kalman gain for the scalar observation
+    ph0 = p00 + p01 * h1
+    ph1 = p10 + p11 * h1
+    innovation_variance = ph0 + h1 * ph1 + observation_covariance
+    k0 = ph0 / innovation_variance
+    k1 = ph1 / innovation_variance
+    
+    # Update state and covariance, P = (I - K h) P
+    innovation = log_price_a - (x[0] + x[1] * h1)
+    new_x = np.empty(2)
+    new_x[0] = x[0] + k0 * innovation
+    new_x[1] = x[1] + k1 * innovation
+    new_P = np.empty((2, 2))
+    new_P[0, 0] = (1.0 - k0) * p00 - k0 * h1 * p10
+    new_P[0, 1] = (1.0 - k0) * p01 - k0 * h1 * p11
+    new_P[1, 0] = (1.0 - k1 * h1) * p10 - k1 * p00
+    new_P[1, 1] = (1.0 - k1 * h1) * p11 - k1 * p01
+    
+    # Spread and its forecast variance under the updated state
+    spread = log_price_a - (new_x[0] + new_x[1] * h1)
+    forecast_variance = (new_P[0, 0] + (new_P[0, 1] + new_P[1, 0]) * h1 +
+                         new_P[1, 1] * h1 * h1 + observation_covariance)
+    return new_x, new_P, spread, forecast_variance
+
+
+if njit is not None:
+    _kf_step = njit(cache=True)(_kf_step)
+
+
 class PairsKalmanFilter:
     """
     Kalman Filter for pairs trading with dynamic hedge ratio estimation.
@@ -42,6 +90,11 @@ class PairsKalmanFilter:
         self.initial_state_covariance = initial_state_covariance
         
         self.logger = get_logger("KalmanFilter")
+        if njit is not None:
+            # Compile (or load from cache) now rather than on the first live update;
+            # float64 arguments match the signature update() calls with
+            _kf_step(np.zeros(2), np.eye(2), 0.0, float(self.transition_covariance),
+                     float(self.observation_covariance), 0.0)
         self.kf = None
         self.is_initialized = False
         
@@ -147,37 +200,16 @@ class PairsKalmanFilter:
             log_price_a = np.log(price_a)
             log_price_b = np.log(price_b)
             
-            # Create observation matrix for single observation
-            observation_matrix = np.array([[1.0, log_price_b]])
-            
-            # Get current state
-            current_state_mean = self.state_means[-1, :]  # Ensure 1D array
-            current_state_covariance = self.state_covariances[-1, :, :]  # Ensure 2D array
-            
-            # Prediction step
-            predicted_state_mean = current_state_mean
-            predicted_state_covariance = current_state_covariance + np.eye(2) * self.transition_covariance
-            
-            # Update step
-            kalman_gain = (predicted_state_covariance @ observation_matrix.T @ 
-                          np.linalg.inv(observation_matrix @ predicted_state_covariance @ 
-                                       observation_matrix.T + self.observation_covariance))
-            
-            # Update state
-            new_state_mean = predicted_state_mean + kalman_gain.flatten() * (log_price_a - 
-                                (observation_matrix @ predicted_state_mean)[0, 0])
-            new_state_covariance = (np.eye(2) - kalman_gain @ observation_matrix) @ predicted_state_covariance
+            # Predict and update from the latest state
+            new_state_mean, new_state_covariance, spread, forecast_variance = _kf_step(
+                self.state_means[-1], self.state_covariances[-1], log_price_b,
+                self.transition_covariance, self.observation_covariance, log_price_a
+            )
             
             # Update stored values
             self.state_means = np.vstack([self.state_means, new_state_mean])
             self.state_covariances = np.vstack([self.state_covariances, new_state_covariance.reshape(1, 2, 2)])
             
-            # Calculate new spread and z-score
-            expected_value = observation_matrix @ new_state_mean
-            spread = log_price_a - expected_value[0, 0]
-            
-            forecast_variance = (observation_matrix @ new_state_covariance @ 
-                               observation_matrix.T + self.observation_covariance)[0, 0]
             z_score = spread / np.sqrt(forecast_variance)
             
             # Update hedge ratio
@@ -10,7 +10,13 @@ import time
 import subprocess
 import sys
 import signal
-from datetime import datetime
+
+def iso_utc_from_ns(ns):
+    """Format a time.time_ns() value as an ISO-8601 UTC timestamp without building a datetime."""
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    tm = time.gmtime(seconds)
+    return (f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d}T"
+            f"{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}.{remainder // 1000:06d}Z")
 
 class QuickOrderTester:
     def __init__(self):
@@ -68,10 +74,11 @@ class QuickOrderTester:
     
     def send_test_signal(self, signal_type, shares_a, shares_b, z_score=2.5):
         """Send a test signal to the order engine."""
+        now_ns = time.time_ns()
         test_signal = {
             'message_type': 'TRADE_SIGNAL',
-            'message_id': f'quick_test_{int(time.time())}',
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'message_id': f'quick_test_{now_ns // 1_000_000_000}',
+            'timestamp': iso_utc_from_ns(now_ns),
             'pair_name': 'EWA_EWC',
             'symbol_a': 'EWA',
             'symbol_b': 'EWC',
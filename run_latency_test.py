@@ -13,48 +13,167 @@ import os
 import signal
 import threading
 import platform
+import json
+import re
 from typing import Optional
 
-def build_cpp_test():
-    """Build the C++ latency test using platform-appropriate commands."""
-    print("Building C++ latency test...")
+CPP_BUILD_DIR = "cpp/build"
+CPP_TEST_TARGET = "latency_measurement_test"
+DEFAULT_CPP_TEST_EXE = "cpp/build/Release/latency_measurement_test.exe"
+EXE_PATH_CACHE = ".latency_exe_path"
+CMAKE_API_DIR = os.path.join(CPP_BUILD_DIR, ".cmake", "api", "v1")
+PGO_DIR = "cpp/build/pgo"
+PGO_MARKER = os.path.join(PGO_DIR, ".trained")
+
+def _request_cmake_codemodel():
+    """Ask CMake to emit its file-API codemodel on the next configure."""
+    query_dir = os.path.join(CMAKE_API_DIR, "query")
+    os.makedirs(query_dir, exist_ok=True)
+    open(os.path.join(query_dir, "codemodel-v2"), "a").close()
+
+def _find_target_artifact(target: str, config: str = "Release") -> Optional[str]:
+    """Read the built artifact path of a target from the CMake file-API reply.
     
+    Works for both multi-config (Visual Studio: build/Release/) and
+    single-config generators (Ninja/Makefiles: build/).
+    """
+    reply_dir = os.path.join(CMAKE_API_DIR, "reply")
     try:
-        # Create build directory
-        os.makedirs("cpp/build", exist_ok=True)
-        
-        # Configure with cmake
-        print("  Configuring with CMake...")
-        config_result = subprocess.run(
-            ["cmake", ".."],
-            cwd="cpp/build",
-            capture_output=True,
-            text=True
-        )
-        
-        if config_result.returncode != 0:
-            print("Failed to configure C++ test")
-            print(config_result.stderr)
-            return False
+        indexes = sorted(f for f in os.listdir(reply_dir) if f.startswith("index-") and f.endswith(".json"))
+        if not indexes:
+            return None
+        with open(os.path.join(reply_dir, indexes[-1])) as f:
+            codemodel_file = json.load(f)["reply"]["codemodel-v2"]["jsonFile"]
+        with open(os.path.join(reply_dir, codemodel_file)) as f:
+            configurations = json.load(f)["configurations"]
         
-        # Build the target
-        print("  Building latency_measurement_test...")
-        build_result = subprocess.run(
-            ["cmake", "--build", ".", "--config", "Release", "--target", "latency_measurement_test"],
-            cwd="cpp/build",
+        configuration = next((c for c in configurations if c["name"] == config), configurations[0])
+        for target_ref in configuration["targets"]:
+            if target_ref["name"] == target:
+                with open(os.path.join(reply_dir, target_ref["jsonFile"])) as f:
+                    artifacts = json.load(f).get("artifacts", [])
+                if artifacts:
+                    return os.path.join(CPP_BUILD_DIR, artifacts[0]["path"])
+    except (OSError, KeyError, ValueError):
+        return None
+    return None
+
+def get_cpp_test_exe() -> str:
+    """Path of the C++ latency test executable, as recorded by the last build."""
+    if os.path.exists(EXE_PATH_CACHE):
+        with open(EXE_PATH_CACHE) as f:
+            cached = f.read().strip()
+        if cached:
+            return cached
+    return DEFAULT_CPP_TEST_EXE
+
+def _configure_and_build(pgo_stage: str = "") -> bool:
+    """Configure and build latency_measurement_test for the given PGO stage ("", generate, use)."""
+    _request_cmake_codemodel()
+    
+    # Configure with cmake (always pass LATENCY_PGO so a previous stage doesn't stick)
+    print(f"  Configuring with CMake (PGO: {pgo_stage or 'off'})...")
+    config_result = subprocess.run(
+        ["cmake", "..", f"-DLATENCY_PGO={pgo_stage}"],
+        cwd=CPP_BUILD_DIR,
+        capture_output=True,
+        text=True
+    )
+    
+    if config_result.returncode != 0:
+        print("Failed to configure C++ test")
+        print(config_result.stderr)
+        return False
+    
+    # Build the target
+    print("  Building latency_measurement_test...")
+    build_result = subprocess.run(
+        ["cmake", "--build", ".", "--config", "Release", "--target", "latency_measurement_test"],
+        cwd=CPP_BUILD_DIR,
+        capture_output=True,
+        text=True
+    )
+    
+    if build_result.returncode != 0:
+        print("Failed to build C++ test")
+        print(build_result.stderr)
+        return False
+    
+    # Locate the executable where the generator actually put it
+    exe_path = _find_target_artifact(CPP_TEST_TARGET) or DEFAULT_CPP_TEST_EXE
+    if not os.path.exists(exe_path):
+        print(f"C++ test executable not found at {exe_path}")
+        return False
+    
+    with open(EXE_PATH_CACHE, "w") as f:
+        f.write(exe_path)
+    
+    return True
+
+def _train_pgo_profile(port: int = 5555) -> bool:
+    """Feed the instrumented receiver a 1000-signal warmup to collect a profile."""
+    print("  Training PGO profile with 1000 warmup signals...")
+    # The receiver has to exit on its own so the instrumented binary flushes its profile
+    cpp_process = subprocess.Popen(
+        [get_cpp_test_exe(), str(port), "15"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        close_fds=False
+    )
+    time.sleep(2)
+    # The receiver is another process, so the signals have to go over TCP.
+    # This is only a warmup, so it leaves no results file or plots behind.
+    trained = run_python_latency_test(1000, 0.0, port, transport="tcp", save_results=False)
+    try:
+        cpp_stdout, _ = cpp_process.communicate(timeout=60)
+    except subprocess.TimeoutExpired:
+        print("  PGO training failed: the receiver did not exit")
+        cpp_process.kill()
+        cpp_process.communicate()
+        return False
+    
+    # A receiver that saw no signals only profiled its idle loop
+    collected = re.search(r"Collected (\d+) measurements", cpp_stdout or "")
+    if not collected or int(collected.group(1)) == 0:
+        print("  PGO training failed: the receiver recorded no signals")
+        trained = False
+    
+    # Clang writes raw profiles that have to be merged before -fprofile-use
+    raw_profiles = [os.path.join(PGO_DIR, f) for f in os.listdir(PGO_DIR) if f.endswith(".profraw")]
+    if raw_profiles:
+        merge_result = subprocess.run(
+            ["llvm-profdata", "merge", "-output", os.path.join(PGO_DIR, "default.profdata"), *raw_profiles],
             capture_output=True,
             text=True
         )
+        trained = trained and merge_result.returncode == 0
+    
+    return trained and cpp_process.returncode == 0
+
+def build_cpp_test(pgo: bool = False, port: int = 5555):
+    """Build the C++ latency test using platform-appropriate commands.
+    
+    With pgo=True the receiver is built with LTO and profile-guided optimization.
+    The training run happens once; later builds reuse the profile cached in PGO_DIR.
+    """
+    print("Building C++ latency test...")
+    
+    try:
+        # Create build directory
+        os.makedirs(CPP_BUILD_DIR, exist_ok=True)
         
-        if build_result.returncode != 0:
-            print("Failed to build C++ test")
-            print(build_result.stderr)
-            return False
-        
-        # Check if executable exists
-        exe_path = "cpp/build/Release/latency_measurement_test.exe"
-        if not os.path.exists(exe_path):
-            print(f"C++ test executable not found at {exe_path}")
+        if pgo:
+            if os.path.exists(PGO_MARKER):
+                print("  Reusing cached PGO profile")
+            else:
+                if not _configure_and_build("generate") or not _train_pgo_profile(port):
+                    print("Failed to collect PGO profile")
+                    return False
+                open(PGO_MARKER, "w").close()
+            if not _configure_and_build("use"):
+                return False
+        elif not _configure_and_build():
             return False
         
         print("C++ test built successfully")
@@ -64,43 +183,35 @@ def build_cpp_test():
         print(f"Build error: {e}")
         return False
 
-def run_python_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int = 5555):
-    """Run the Python latency test."""
+def run_python_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int = 5555,
+                            transport: str = "inproc", save_results: bool = True):
+    """Run the Python latency test in-process."""
     print(f"Starting Python latency test...")
     print(f"   Signals: {num_signals}")
     print(f"   Delay: {delay_ms}ms")
     print(f"   Port: {port}")
+    print(f"   Transport: {transport}")
     
     try:
-        # Run the Python latency test
-        cmd = [
-            sys.executable, 
-            "tests/latency_measurement_test.py",
-            "--signals", str(num_signals),
-            "--delay", str(delay_ms),
-            "--port", str(port)
-        ]
+        # Imported lazily: the test module pulls in numpy/matplotlib/zmq
+        from tests import latency_measurement_test
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
+        if latency_measurement_test.run_latency_test(
+            num_signals=num_signals, delay_ms=delay_ms, port=port, transport=transport,
+            save_results=save_results
+        ):
             print("Python latency test completed successfully")
-            print(result.stdout)
         else:
             print("Python latency test failed")
-            print(result.stderr)
             return False
             
-    except subprocess.TimeoutExpired:
-        print("Python latency test timed out")
-        return False
     except Exception as e:
         print(f"Python latency test error: {e}")
         return False
     
     return True
 
-def run_cpp_latency_test(port: int = 5555, duration_seconds: int = 30):
+def run_cpp_latency_test(port: int = 5555, duration_seconds: int = 30, pgo: bool = False):
     """Run the C++ latency test."""
     print(f"Starting C++ latency test...")
     print(f"   Port: {port}")
@@ -108,14 +219,14 @@ def run_cpp_latency_test(port: int = 5555, duration_seconds: int = 30):
     
     try:
         # Build the C++ test first
-        if not build_cpp_test():
+        if not build_cpp_test(pgo=pgo, port=port):
             return False
         
         # Run the C++ test
-        cpp_test_path = "cpp/build/Release/latency_measurement_test.exe"
-        cmd = [cpp_test_path, str(port), str(duration_seconds)]
+        cmd = [get_cpp_test_exe(), str(port), str(duration_seconds)]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=duration_seconds + 60)
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=duration_seconds + 60,
+                                close_fds=False)
         
         if result.returncode == 0:
             print("C++ latency test completed successfully")
@@ -134,7 +245,8 @@ def run_cpp_latency_test(port: int = 5555, duration_seconds: int = 30):
     
     return True
 
-def run_combined_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int = 5555):
+def run_combined_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int = 5555,
+                              pgo: bool = False):
     """Run both Python and C++ tests simultaneously for end-to-end measurement."""
     print("Starting Combined End-to-End Latency Test")
     print("=" * 60)
@@ -149,7 +261,7 @@ def run_combined_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, po
     
     # Build C++ test first
     print("\nBuilding C++ test...")
-    if not build_cpp_test():
+    if not build_cpp_test(pgo=pgo, port=port):
         print("Failed to build C++ test - running Python test only")
         return run_python_latency_test(num_signals, delay_ms, port)
     
@@ -159,44 +271,27 @@ def run_combined_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, po
     
     try:
         # Start C++ test
-        cpp_test_path = "cpp/build/Release/latency_measurement_test.exe"
         cpp_process = subprocess.Popen(
-            [cpp_test_path, str(port), str(test_duration)],
+            [get_cpp_test_exe(), str(port), str(test_duration)],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True
+            text=True,
+            # Allows the posix_spawn fast path (no fork of this process)
+            close_fds=False
         )
         
         # Wait a moment for C++ to start
         time.sleep(2)
         
-        # Start Python test
+        # Run Python sender in-process while the C++ receiver runs; the receiver
+        # is another process, so the signals have to go over TCP
         print("Starting Python sender...")
-        python_cmd = [
-            sys.executable, 
-            "tests/latency_measurement_test.py",
-            "--signals", str(num_signals),
-            "--delay", str(delay_ms),
-            "--port", str(port)
-        ]
-        
-        python_process = subprocess.Popen(
-            python_cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        # Wait for Python test to complete
-        print("Waiting for tests to complete...")
-        python_stdout, python_stderr = python_process.communicate(timeout=test_duration + 60)
-        
-        if python_process.returncode != 0:
+        if not run_python_latency_test(num_signals, delay_ms, port, transport="tcp"):
             print("Python test failed")
-            print(python_stderr)
             return False
         
         # Wait for C++ test to complete
+        print("Waiting for C++ receiver to complete...")
         cpp_stdout, cpp_stderr = cpp_process.communicate(timeout=30)
         
         if cpp_process.returncode != 0:
@@ -209,10 +304,6 @@ def run_combined_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, po
         print("COMBINED TEST RESULTS")
         print("="*60)
         
-        print("\nPython Test Output:")
-        print("-" * 30)
-        print(python_stdout)
-        
         print("\nC++ Test Output:")
         print("-" * 30)
         print(cpp_stdout)
@@ -254,6 +345,7 @@ Options:
   --signals N           Number of signals to send (default: 1000)
   --delay MS            Delay between signals in milliseconds (default: 1.0)
   --port PORT           ZMQ port to use (default: 5555)
+  --pgo                 Build the C++ receiver with LTO + profile-guided optimization
   --help                Show this help message
 
 Examples:
@@ -281,6 +373,7 @@ def main():
     parser.add_argument("--signals", type=int, default=1000, help="Number of signals")
     parser.add_argument("--delay", type=float, default=1.0, help="Delay between signals (ms)")
     parser.add_argument("--port", type=int, default=5555, help="ZMQ port")
+    parser.add_argument("--pgo", action="store_true", help="Build C++ receiver with PGO + LTO")
     
     args = parser.parse_args()
     
@@ -304,9 +397,9 @@ def main():
         if mode == "python":
             success = run_python_latency_test(args.signals, args.delay, args.port)
         elif mode == "cpp":
-            success = run_cpp_latency_test(args.port, int(args.signals * args.delay / 1000) + 10)
+            success = run_cpp_latency_test(args.port, int(args.signals * args.delay / 1000) + 10, pgo=args.pgo)
         else:  # combined
-            success = run_combined_latency_test(args.signals, args.delay, args.port)
+            success = run_combined_latency_test(args.signals, args.delay, args.port, pgo=args.pgo)
             
     except KeyboardInterrupt:
         print("\nTest interrupted by user")
@@ -5,6 +5,12 @@ import os
 import signal
 import time
 import threading
+import selectors
+import ctypes
+
+# Windows pipes cannot be registered with a selector, so fall back to one
+# reader thread per child there.
+USE_SELECTORS = os.name != 'nt'
 
 # Optional: Check TWS connectivity before starting
 try:
@@ -32,24 +38,74 @@ def check_tws_connection(host='127.0.0.1', port=7497, client_id=999):
         return False
 
 def stream_subprocess_output(proc, name):
-    for line in iter(proc.stdout.readline, ''):
-        if not line:
+    # The pipe is unbuffered (bufsize=0), where readline() costs a syscall per
+    # byte, so read in chunks and split lines here like pump_subprocess_output.
+    fd = proc.stdout.fileno()
+    pending = b''
+    while True:
+        data = os.read(fd, 65536)
+        if not data:
             break
-        print(f"[{name}] {line.rstrip()}")
+        pending += data
+        *lines, pending = pending.split(b'\n')
+        for line in lines:
+            print(f"[{name}] {line.decode(errors='replace').rstrip()}")
+    if pending:
+        print(f"[{name}] {pending.decode(errors='replace').rstrip()}")
     proc.stdout.close()
 
-def start_process(cmd, name, env=None):
+def pump_subprocess_output(sel, timeout):
+    """Forward whatever child output is ready, prefixed with the process name."""
+    for key, _ in sel.select(timeout=timeout):
+        if key.data is None:
+            # Signal wakeup pipe: drain it, the caller re-checks the children.
+            os.read(key.fd, 512)
+            continue
+        name, pending = key.data
+        data = os.read(key.fd, 65536)
+        if not data:
+            sel.unregister(key.fileobj)
+            if pending:
+                print(f"[{name}] {pending.decode(errors='replace').rstrip()}")
+            continue
+        pending += data
+        *lines, rest = pending.split(b'\n')
+        pending[:] = rest
+        for line in lines:
+            print(f"[{name}] {line.decode(errors='replace').rstrip()}")
+
+def install_child_wakeup(sel):
+    """Make SIGCHLD (and any other handled signal) wake the selector."""
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    # A Python-level handler is required for the wakeup fd to be written to.
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(write_fd)
+    sel.register(read_fd, selectors.EVENT_READ, None)
+
+def wait_for_child_exit(procs, timeout_ms):
+    """Block until one of the child processes exits (Windows)."""
+    handles = (ctypes.c_void_p * len(procs))(*(int(proc._handle) for proc in procs))
+    ctypes.windll.kernel32.WaitForMultipleObjects(len(procs), handles, False, timeout_ms)
+
+def start_process(cmd, name, env=None, sel=None):
     proc = subprocess.Popen(
         cmd,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT,
-        bufsize=1,
-        universal_newlines=True,
+        bufsize=0,
         shell=False,
+        # close_fds=False lets CPython launch via posix_spawn instead of
+        # fork+exec; our own fds are non-inheritable (PEP 446) regardless.
+        close_fds=False,
         env=env
     )
-    t = threading.Thread(target=stream_subprocess_output, args=(proc, name), daemon=True)
-    t.start()
+    if sel is not None:
+        sel.register(proc.stdout, selectors.EVENT_READ, (name, bytearray()))
+    else:
+        t = threading.Thread(target=stream_subprocess_output, args=(proc, name), daemon=True)
+        t.start()
     return proc
 
 def main():
@@ -67,11 +123,15 @@ def main():
         print("[FATAL] TWS not reachable. Start TWS and enable API access.")
         sys.exit(1)
 
+    sel = selectors.DefaultSelector() if USE_SELECTORS else None
+    if sel is not None:
+        install_child_wakeup(sel)
+
     print("[INFO] Starting Python data engine...")
-    py_proc = start_process(python_engine, 'PYTHON', env=env)
+    py_proc = start_process(python_engine, 'PYTHON', env=env, sel=sel)
     time.sleep(2)
     print("[INFO] Starting C++ order engine...")
-    cpp_proc = start_process(cpp_engine, 'CPP')
+    cpp_proc = start_process(cpp_engine, 'CPP', sel=sel)
 
     procs = [py_proc, cpp_proc]
     running = True
@@ -103,7 +163,12 @@ def main():
                 if ret is not None:
                     print(f"[ERROR] {name} process exited with code {ret}.")
                     shutdown(None, None)
-            time.sleep(1)
+            if sel is not None:
+                # No timeout: child output and SIGCHLD both wake the selector.
+                pump_subprocess_output(sel, timeout=None)
+            else:
+                # Bounded so Ctrl+C is still serviced on the main thread.
+                wait_for_child_exit(procs, 1000)
     except Exception as e:
         print(f"[FATAL] Exception in orchestrator: {e}")
         shutdown(None, None)
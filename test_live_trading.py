@@ -4,45 +4,244 @@ Live Trading Test Script
 Tests the complete pairs trading system end-to-end including order execution.
 """
 
+import asyncio
 import subprocess
 import time
 import threading
+import multiprocessing
 import signal
+import logging
+import logging.handlers
+import queue
 import sys
 import os
 import zmq
-import json
-from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+import zmq.asyncio
+import orjson
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, NamedTuple, Optional
+
+# uvloop is optional (and unavailable on Windows); fall back to the stock loop
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Endpoint the generated test signals are pushed to. Nothing in this repo
+# consumes it yet: the engines don't read test signals, so an external PULL
+# consumer has to connect here, or generation is skipped. A Unix domain socket
+# is used where available; pass "inproc://..." for a consumer sharing self.context.
+DEFAULT_TEST_SIGNAL_ENDPOINT = "tcp://*:5556" if sys.platform == 'win32' else "ipc:///tmp/test_signals"
+
+logger = logging.getLogger("live_test")
+
+# Topic frames the monitor handles; everything else is filtered out by the SUB socket
+MONITORED_TOPICS = (b'TRADE_SIGNAL', b'POSITION_UPDATE', b'SYSTEM_STATUS', b'HEARTBEAT')
+
+TEST_NAMES = ('long_spread_test', 'short_spread_test', 'order_execution', 'market_data')
+
+
+class MonitorState:
+    """Results shared between the test driver and the monitor process."""
+    
+    def __init__(self, mp_context, manager):
+        self.test_results = manager.dict({name: False for name in TEST_NAMES})
+        self.signal_count = mp_context.Value('i', 0)
+        self.order_count = mp_context.Value('i', 0)
+        
+        # Set when the engine publishes its first message / when every check has passed
+        self.system_ready = mp_context.Event()
+        self.done = mp_context.Event()
+        self.stop = mp_context.Event()
+
+
+def _mark_passed(state: MonitorState, test_name: str, passed: Optional[set] = None):
+    """Record a passed check and signal completion once all have passed.
+    
+    passed holds the checks this process has already recorded; repeats return
+    without a Manager round trip.
+    """
+    if passed is not None:
+        if test_name in passed:
+            return
+        passed.add(test_name)
+    state.test_results[test_name] = True
+    if all(state.test_results.values()):
+        state.done.set()
+
+
+class SignalMsg(NamedTuple):
+    signal_type: str
+    pair_name: str
+    z_score: float
+
+
+class PositionMsg(NamedTuple):
+    current_position: str
+    shares_a: int
+    shares_b: int
+
+
+class StatusMsg(NamedTuple):
+    component: str
+    status: str
+
+
+def _handle_message(state: MonitorState, data: Dict[str, Any], passed: set):
+    """Update counters and test results for one decoded message."""
+    # Single lookup; the branch fields are required by message_protocol
+    message_type = data.get('message_type')
+    
+    if message_type == 'TRADE_SIGNAL':
+        with state.signal_count.get_lock():
+            state.signal_count.value += 1
+        msg = SignalMsg(data['signal_type'], data['pair_name'], data['z_score'])
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Signal #%d: %s for %s (Z-Score: %.3f)",
+                        state.signal_count.value, msg.signal_type, msg.pair_name, msg.z_score)
+        
+        if msg.signal_type == 'ENTER_LONG_SPREAD':
+            _mark_passed(state, 'long_spread_test', passed)
+        elif msg.signal_type == 'ENTER_SHORT_SPREAD':
+            _mark_passed(state, 'short_spread_test', passed)
+    
+    elif message_type == 'POSITION_UPDATE':
+        with state.order_count.get_lock():
+            state.order_count.value += 1
+        msg = PositionMsg(data['current_position'], data['shares_a'], data['shares_b'])
+        
+        logger.info("Order #%d: %s - A: %s, B: %s",
+                    state.order_count.value, msg.current_position, msg.shares_a, msg.shares_b)
+        _mark_passed(state, 'order_execution', passed)
+    
+    elif message_type == 'SYSTEM_STATUS':
+        msg = StatusMsg(data['component'], data['status'])
+        logger.info("System Status: %s - %s", msg.component, msg.status)
+
+
+def _start_monitor_logging() -> logging.handlers.QueueListener:
+    """Route monitor logging through a queue so formatting and I/O happen off the hot path."""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    return listener
+
+
+def _monitor_worker(state: MonitorState, test_duration: float):
+    """Monitor process body: subscribe to the engine's feed and record results.
+    
+    Runs in its own process so message handling never competes with the
+    test driver for the GIL. Ctrl+C is handled by the parent, which sets
+    state.stop.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    
+    context = zmq.Context()
+    subscriber = context.socket(zmq.SUB)
+    subscriber.setsockopt(zmq.RCVHWM, 100000)  # absorb signal bursts without drops
+    subscriber.setsockopt(zmq.LINGER, 0)  # don't let context.term() hang on exit
+    subscriber.setsockopt(zmq.TCP_KEEPALIVE, 1)  # detect a dead publisher
+    subscriber.connect("tcp://localhost:5555")
+    # Filter on the topic frame so libzmq drops the traffic we never look at
+    for topic in MONITORED_TOPICS:
+        subscriber.setsockopt(zmq.SUBSCRIBE, topic)
+    poller = zmq.Poller()
+    poller.register(subscriber, zmq.POLLIN)
+    
+    listener = _start_monitor_logging()
+    logger.info("📡 Monitoring signals and orders...")
+    
+    deadline = time.monotonic() + test_duration
+    # Local copies of shared state, so the drain loop only crosses processes on a change
+    ready = False
+    passed = set()
+    
+    try:
+        while not state.stop.is_set() and time.monotonic() < deadline:
+            # Wait up to 1s for traffic, then drain everything already queued
+            socks = dict(poller.poll(timeout=1000))
+            if subscriber not in socks:
+                continue
+            
+            while True:
+                try:
+                    # Publisher sends [topic, payload]; the JSON body is the last frame.
+                    # copy=False hands back zmq.Frames so orjson parses libzmq's buffer directly.
+                    frames = subscriber.recv_multipart(zmq.NOBLOCK, copy=False)
+                except zmq.Again:
+                    break
+                
+                # Any message means the engine is up
+                if not ready:
+                    state.system_ready.set()
+                    ready = True
+                
+                # Heartbeats only prove the engine is up; no need to decode them
+                if frames[0].bytes == b'HEARTBEAT':
+                    continue
+                
+                try:
+                    _handle_message(state, orjson.loads(frames[-1].buffer), passed)
+                except Exception as e:
+                    logger.error("Error monitoring messages: %s", e)
+    finally:
+        subscriber.close()
+        context.term()
+        listener.stop()
+
 
 class LiveTradingTester:
-    def __init__(self):
+    def __init__(self, test_signal_endpoint: str = DEFAULT_TEST_SIGNAL_ENDPOINT,
+                 echo_system_output: bool = False):
         self.python_proc = None
         self.cpp_proc = None
+        self.system_log = None
+        self.echo_system_output = echo_system_output
+        self.output_thread = None
         self.running = True
-        self.test_results = {
-            'long_spread_test': False,
-            'short_spread_test': False,
-            'order_execution': False,
-            'market_data': False
-        }
         
-        # ZMQ subscriber for monitoring signals
-        self.context = zmq.Context()
-        self.subscriber = None
+        # Monitor runs in a separate process; spawn behaves the same on every platform
+        self.mp_context = multiprocessing.get_context('spawn')
+        self.manager = self.mp_context.Manager()
+        self.monitor_state = MonitorState(self.mp_context, self.manager)
+        self.monitor_process = None
+        
+        # ZMQ context for the test-signal publisher
+        self.context = zmq.asyncio.Context()
         
         # Test parameters
         self.test_duration = 120  # 2 minutes
-        self.signal_count = 0
-        self.order_count = 0
+        self.signal_interval = 2.0  # seconds between generated test signals
+        self.test_signal_endpoint = test_signal_endpoint
+    
+    @property
+    def test_results(self):
+        return self.monitor_state.test_results
+    
+    @property
+    def signal_count(self) -> int:
+        return self.monitor_state.signal_count.value
+    
+    @property
+    def order_count(self) -> int:
+        return self.monitor_state.order_count.value
         
     def setup_zmq_monitoring(self):
-        """Setup ZMQ subscriber to monitor signals and orders."""
+        """Start the monitor process that subscribes to signals and orders."""
         try:
-            self.subscriber = self.context.socket(zmq.SUB)
-            self.subscriber.connect("tcp://localhost:5555")
-            self.subscriber.setsockopt_string(zmq.SUBSCRIBE, "")
-            self.subscriber.setsockopt(zmq.RCVTIMEO, 1000)  # 1 second timeout
+            self.monitor_process = self.mp_context.Process(
+                target=_monitor_worker,
+                args=(self.monitor_state, self.test_duration),
+                daemon=True
+            )
+            self.monitor_process.start()
             print("ZMQ monitoring setup complete")
             return True
         except Exception as e:
@@ -54,86 +253,63 @@ class LiveTradingTester:
         print("🚀 Starting trading system...")
         
         try:
-            # Start the main trading system
+            # Start the main trading system. Output goes straight to a log file:
+            # an unread PIPE would stall the engine once its buffer filled up.
+            # When echoing, a drainer thread copies the raw pipe in 64 KiB chunks.
+            self.system_log = open('trading_system.log', 'wb')
             self.python_proc = subprocess.Popen(
                 [sys.executable, 'run_trading_system.py'],
-                stdout=subprocess.PIPE,
+                stdout=subprocess.PIPE if self.echo_system_output else self.system_log,
                 stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
+                bufsize=0
             )
             
-            print("Trading system started")
+            if self.echo_system_output:
+                self.output_thread = threading.Thread(target=self._drain_system_output, daemon=True)
+                self.output_thread.start()
+            
+            print("Trading system started (output in trading_system.log)")
             return True
             
         except Exception as e:
             print(f"Failed to start trading system: {e}")
             return False
     
-    def monitor_signals_and_orders(self):
-        """Monitor ZMQ messages for signals and orders."""
-        print("📡 Monitoring signals and orders...")
-        
-        start_time = time.time()
-        
-        while self.running and (time.time() - start_time) < self.test_duration:
-            try:
-                message = self.subscriber.recv_string()
-                data = json.loads(message)
-                
-                message_type = data.get('message_type', '')
-                
-                if message_type == 'TRADE_SIGNAL':
-                    self.signal_count += 1
-                    signal_type = data.get('signal_type', '')
-                    pair_name = data.get('pair_name', '')
-                    z_score = data.get('z_score', 0)
-                    
-                    print(f"Signal #{self.signal_count}: {signal_type} for {pair_name} (Z-Score: {z_score:.3f})")
-                    
-                    if signal_type == 'ENTER_LONG_SPREAD':
-                        self.test_results['long_spread_test'] = True
-                    elif signal_type == 'ENTER_SHORT_SPREAD':
-                        self.test_results['short_spread_test'] = True
-                
-                elif message_type == 'POSITION_UPDATE':
-                    self.order_count += 1
-                    position_type = data.get('current_position', '')
-                    shares_a = data.get('shares_a', 0)
-                    shares_b = data.get('shares_b', 0)
-                    
-                    print(f"Order #{self.order_count}: {position_type} - A: {shares_a}, B: {shares_b}")
-                    self.test_results['order_execution'] = True
-                
-                elif message_type == 'SYSTEM_STATUS':
-                    status = data.get('status', '')
-                    component = data.get('component', '')
-                    print(f"System Status: {component} - {status}")
-                
-            except zmq.Again:
-                # Timeout - continue monitoring
-                continue
-            except Exception as e:
-                print(f"Error monitoring messages: {e}")
-                continue
+    def _drain_system_output(self):
+        """Copy the engine's stdout to the log file and console without line decoding."""
+        fd = self.python_proc.stdout.fileno()
+        while True:
+            # Returns whatever is buffered (up to 64 KiB) in one syscall
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            self.system_log.write(chunk)
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        self.python_proc.stdout.close()
+    
+    async def _wait_for(self, event, timeout: float) -> bool:
+        """Wait on a multiprocessing event without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, event.wait, timeout)
     
-    def check_market_data_flow(self):
+    async def check_market_data_flow(self):
         """Check if market data is flowing properly."""
         print("Checking market data flow...")
         
         # Wait for initial market data
-        time.sleep(10)
+        await asyncio.sleep(10)
         
         # Check if we're receiving price updates
         if self.signal_count > 0:
-            self.test_results['market_data'] = True
+            _mark_passed(self.monitor_state, 'market_data')
             print("Market data is flowing")
         else:
             print("No signals received - market data may not be flowing")
     
-    def generate_test_signals(self):
-        """Generate test signals by modifying strategy parameters temporarily."""
-        print("Generating test signals...")
+    async def generate_test_signals(self):
+        """Push test signals to an external consumer on test_signal_endpoint, if one is connected."""
+        print(f"Generating test signals on {self.test_signal_endpoint} (requires an external consumer)...")
         
         # Create a test signal generator
         test_signals = [
@@ -183,40 +359,68 @@ class LiveTradingTester:
             }
         ]
         
-        # Send test signals via ZMQ
-        publisher = self.context.socket(zmq.PUB)
-        publisher.bind("tcp://*:5556")  # Use different port for test signals
-        time.sleep(0.1)  # Allow binding
+        # Send test signals via ZMQ. PUSH queues for the consumer instead of
+        # dropping messages to a late joiner the way PUB does. The trading
+        # engine does not read this endpoint; see DEFAULT_TEST_SIGNAL_ENDPOINT.
+        publisher = self.context.socket(zmq.PUSH)
+        publisher.setsockopt(zmq.SNDHWM, 1000)
+        publisher.setsockopt(zmq.SNDTIMEO, 5000)  # don't block forever without a consumer
+        publisher.setsockopt(zmq.LINGER, 1000)
+        publisher.bind(self.test_signal_endpoint)  # Separate endpoint for test signals
+        
+        # A PUSH socket only becomes writable once a consumer has connected
+        # poll() returns 0 on timeout rather than raising
+        if not await publisher.poll(5000, zmq.POLLOUT):
+            print(f"No consumer connected to {self.test_signal_endpoint} - test signals not sent")
+            publisher.close()
+            return
+        
+        # One timestamp and id base per batch instead of per message
+        batch_timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        batch_id = int(time.time())
         
+        # Proper trade signal format; the per-signal fields are overwritten in the loop
+        trade_signal = {
+            'message_type': 'TRADE_SIGNAL',
+            'message_id': '',
+            'timestamp': batch_timestamp,
+            'position_size': 100,
+            'volatility': 0.15,
+            'correlation': 0.85
+        }
+        
+        next_send = time.monotonic()
         for i, test_signal in enumerate(test_signals):
+            # Pace sends on a fixed schedule rather than sleeping after each one
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_send += self.signal_interval
+            
             print(f"Sending test signal {i+1}: {test_signal['signal_type']}")
             
-            # Create proper trade signal format
-            trade_signal = {
-                'message_type': 'TRADE_SIGNAL',
-                'message_id': f'test_{i}_{int(time.time())}',
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'pair_name': test_signal['pair_name'],
-                'symbol_a': test_signal['symbol_a'],
-                'symbol_b': test_signal['symbol_b'],
-                'signal_type': test_signal['signal_type'],
-                'z_score': test_signal['z_score'],
-                'hedge_ratio': test_signal['hedge_ratio'],
-                'confidence': test_signal['confidence'],
-                'position_size': 100,
-                'shares_a': test_signal['shares_a'],
-                'shares_b': test_signal['shares_b'],
-                'volatility': 0.15,
-                'correlation': 0.85
-            }
+            trade_signal['message_id'] = f'test_{i}_{batch_id}'
+            trade_signal.update(test_signal)
             
-            publisher.send_string(json.dumps(trade_signal))
-            time.sleep(2)  # Wait between signals
+            try:
+                await publisher.send(orjson.dumps(trade_signal))
+            except zmq.Again:
+                print("No consumer connected for test signals - stopping signal generation")
+                break
         
         publisher.close()
     
     def run_test(self):
         """Run the complete live trading test."""
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        elif sys.platform == 'win32':
+            # zmq.asyncio needs a selector-based loop on Windows
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+        return asyncio.run(self._run_test_async())
+    
+    async def _run_test_async(self):
+        """Run the test steps on the event loop."""
         print("Starting Live Trading Test")
         print("=" * 50)
         
@@ -229,30 +433,20 @@ class LiveTradingTester:
             if not self.start_trading_system():
                 return False
             
-            # Wait for system to initialize
+            # Wait for system to initialize: the first published message means it's up
             print("Waiting for system initialization...")
-            time.sleep(15)
-            
-            # Start monitoring in background
-            monitor_thread = threading.Thread(target=self.monitor_signals_and_orders)
-            monitor_thread.daemon = True
-            monitor_thread.start()
+            if not await self._wait_for(self.monitor_state.system_ready, 15):
+                print("No messages from the trading system after 15s - continuing anyway")
             
             # Check market data flow
-            self.check_market_data_flow()
+            await self.check_market_data_flow()
             
             # Generate test signals
-            self.generate_test_signals()
-            
-            # Wait for test completion
-            print(f"Running test for {self.test_duration} seconds...")
-            time.sleep(self.test_duration)
-            
-            # Stop monitoring
-            self.running = False
+            await self.generate_test_signals()
             
-            # Wait for monitoring thread to finish
-            monitor_thread.join(timeout=5)
+            # Wait for test completion (returns early once every check has passed)
+            print(f"Running test for up to {self.test_duration} seconds...")
+            await self._wait_for(self.monitor_state.done, self.test_duration)
             
             return True
             
@@ -271,10 +465,13 @@ class LiveTradingTester:
         
         # Stop monitoring
         self.running = False
+        self.monitor_state.stop.set()
+        if self.monitor_process:
+            self.monitor_process.join(timeout=5)
+            if self.monitor_process.is_alive():
+                self.monitor_process.terminate()
         
         # Close ZMQ connections
-        if self.subscriber:
-            self.subscriber.close()
         self.context.term()
         
         # Stop trading system
@@ -285,6 +482,12 @@ class LiveTradingTester:
                 self.python_proc.wait(timeout=10)
             except subprocess.TimeoutExpired:
                 self.python_proc.kill()
+        
+        if self.output_thread:
+            self.output_thread.join(timeout=5)
+        
+        if self.system_log:
+            self.system_log.close()
     
     def print_results(self):
         """Print test results."""
@@ -317,9 +520,17 @@ def signal_handler(signum, frame):
     print(f"\nReceived signal {signum}, stopping test...")
     if hasattr(signal_handler, 'tester'):
         signal_handler.tester.running = False
+        signal_handler.tester.monitor_state.stop.set()
 
 def main():
     """Main test function."""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Live Trading System Test")
+    parser.add_argument("--echo-output", action="store_true",
+                        help="Also echo the trading system's output to the console (always logged to trading_system.log)")
+    args = parser.parse_args()
+    
     print("Live Trading System Test")
     print("This test will:")
     print("1. Start the complete trading system")
@@ -334,7 +545,7 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
     
     # Create and run tester
-    tester = LiveTradingTester()
+    tester = LiveTradingTester(echo_system_output=args.echo_output)
     signal_handler.tester = tester
     
     try:
@@ -11,140 +11,137 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../python')))
 
 import time
-import json
+import itertools
 import threading
-import statistics
+import warnings
 import zmq
+import orjson
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import deque
+
+# numba is optional; without it the risk check below runs as plain Python
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 # Import our trading system components
-from comms.message_protocol import SignalType, create_trade_signal, create_heartbeat
+from comms.message_protocol import SignalType, create_trade_signal
 from comms.signaler import SignalPublisher
-from strategy.kalman_filter import PairsKalmanFilter
-
-
-@dataclass
-class LatencyMeasurement:
-    """Data structure for storing latency measurements."""
-    signal_id: str
-    python_generation_start: float = None
-    python_generation_end: float = None
-    python_serialization_start: float = None
-    python_serialization_end: float = None
-    python_zmq_send_start: float = None
-    python_zmq_send_end: float = None
-    cpp_receive_start: Optional[float] = None
-    cpp_receive_end: Optional[float] = None
-    cpp_parsing_start: Optional[float] = None
-    cpp_parsing_end: Optional[float] = None
-    cpp_risk_check_start: Optional[float] = None
-    cpp_risk_check_end: Optional[float] = None
-    cpp_order_creation_start: Optional[float] = None
-    cpp_order_creation_end: Optional[float] = None
-    cpp_tws_submit_start: Optional[float] = None
-    cpp_tws_submit_end: Optional[float] = None
-    error_message: Optional[str] = None
-
-    def get_python_generation_latency(self) -> float:
-        """Get Python signal generation latency in microseconds."""
-        return (self.python_generation_end - self.python_generation_start) * 1_000_000
-
-    def get_python_serialization_latency(self) -> float:
-        """Get Python serialization latency in microseconds."""
-        return (self.python_serialization_end - self.python_serialization_start) * 1_000_000
-
-    def get_python_zmq_latency(self) -> float:
-        """Get Python ZMQ send latency in microseconds."""
-        return (self.python_zmq_send_end - self.python_zmq_send_start) * 1_000_000
-
-    def get_network_latency(self) -> Optional[float]:
-        """Get network transmission latency in microseconds."""
-        if self.cpp_receive_start is None:
-            return None
-        # Use Python ZMQ send start instead of end to avoid negative values
-        # Cap at 0 since negative values indicate very fast transmission
-        latency = (self.cpp_receive_start - self.python_zmq_send_start) * 1_000_000
-        return max(0, latency)  # Cap negative values at 0
-
-    def get_cpp_receive_latency(self) -> Optional[float]:
-        """Get C++ receive latency in microseconds."""
-        if self.cpp_receive_end is None or self.cpp_receive_start is None:
-            return None
-        return (self.cpp_receive_end - self.cpp_receive_start) * 1_000_000
-
-    def get_cpp_parsing_latency(self) -> Optional[float]:
-        """Get C++ parsing latency in microseconds."""
-        if self.cpp_parsing_end is None or self.cpp_parsing_start is None:
-            return None
-        return (self.cpp_parsing_end - self.cpp_parsing_start) * 1_000_000
-
-    def get_cpp_risk_check_latency(self) -> Optional[float]:
-        """Get C++ risk check latency in microseconds."""
-        if self.cpp_risk_check_end is None or self.cpp_risk_check_start is None:
-            return None
-        return (self.cpp_risk_check_end - self.cpp_risk_check_start) * 1_000_000
-
-    def get_cpp_order_creation_latency(self) -> Optional[float]:
-        """Get C++ order creation latency in microseconds."""
-        if self.cpp_order_creation_end is None or self.cpp_order_creation_start is None:
-            return None
-        return (self.cpp_order_creation_end - self.cpp_order_creation_start) * 1_000_000
-
-    def get_cpp_tws_latency(self) -> Optional[float]:
-        """Get C++ TWS submission latency in microseconds."""
-        if self.cpp_tws_submit_end is None or self.cpp_tws_submit_start is None:
-            return None
-        return (self.cpp_tws_submit_end - self.cpp_tws_submit_start) * 1_000_000
-
-    def get_total_python_latency(self) -> float:
-        """Get total Python-side latency in microseconds."""
-        return (self.python_zmq_send_end - self.python_generation_start) * 1_000_000
-
-    def get_total_cpp_latency(self) -> Optional[float]:
-        """Get total C++-side latency in microseconds."""
-        if self.cpp_tws_submit_end is None or self.cpp_receive_start is None:
-            return None
-        return (self.cpp_tws_submit_end - self.cpp_receive_start) * 1_000_000
-
-    def get_end_to_end_latency(self) -> Optional[float]:
-        """Get end-to-end latency in microseconds."""
-        if self.cpp_tws_submit_end is None:
-            return None
-        return (self.cpp_tws_submit_end - self.python_generation_start) * 1_000_000
+
+
+# Columns of the (N, 16) timestamp matrix: one row per signal, one column per
+# stage boundary, perf_counter_ns() integers, 0 until recorded.
+TIMESTAMP_COLUMNS = (
+    "python_generation_start", "python_generation_end",
+    "python_serialization_start", "python_serialization_end",
+    "python_zmq_send_start", "python_zmq_send_end",
+    "cpp_receive_start", "cpp_receive_end",
+    "cpp_parsing_start", "cpp_parsing_end",
+    "cpp_risk_check_start", "cpp_risk_check_end",
+    "cpp_order_creation_start", "cpp_order_creation_end",
+    "cpp_tws_submit_start", "cpp_tws_submit_end",
+)
+(PY_GEN_START, PY_GEN_END, PY_SER_START, PY_SER_END, PY_SEND_START, PY_SEND_END,
+ CPP_RECV_START, CPP_RECV_END, CPP_PARSE_START, CPP_PARSE_END, CPP_RISK_START, CPP_RISK_END,
+ CPP_ORDER_START, CPP_ORDER_END, CPP_TWS_START, CPP_TWS_END) = range(len(TIMESTAMP_COLUMNS))
+
+# Report stage -> (start column, end column)
+LATENCY_STAGES = {
+    "python_generation": (PY_GEN_START, PY_GEN_END),
+    "python_serialization": (PY_SER_START, PY_SER_END),
+    "python_zmq": (PY_SEND_START, PY_SEND_END),
+    "python_total": (PY_GEN_START, PY_SEND_END),
+    # From send start rather than end, so very fast deliveries don't go negative
+    "network": (PY_SEND_START, CPP_RECV_START),
+    "cpp_receive": (CPP_RECV_START, CPP_RECV_END),
+    "cpp_parsing": (CPP_PARSE_START, CPP_PARSE_END),
+    "cpp_risk_check": (CPP_RISK_START, CPP_RISK_END),
+    "cpp_order_creation": (CPP_ORDER_START, CPP_ORDER_END),
+    "cpp_tws": (CPP_TWS_START, CPP_TWS_END),
+    "cpp_total": (CPP_RECV_START, CPP_TWS_END),
+    "end_to_end": (PY_GEN_START, CPP_TWS_END),
+}
+
+# Per-signal keys in the results file that don't follow "<stage>_latency"
+RESULT_KEYS = {
+    "python_total": "total_python_latency",
+    "cpp_total": "total_cpp_latency",
+}
+
+
+# Column of each stage in the (N, stages) latency matrix
+STAGE_INDEX = {stage: i for i, stage in enumerate(LATENCY_STAGES)}
+STAGE_STARTS = np.array([start for start, _ in LATENCY_STAGES.values()])
+STAGE_ENDS = np.array([end for _, end in LATENCY_STAGES.values()])
+
+
+def stage_latency_matrix(timestamps: np.ndarray) -> np.ndarray:
+    """Get every stage's latency for every row in microseconds, one column per stage (NaN where not recorded)."""
+    starts = timestamps[:, STAGE_STARTS]
+    ends = timestamps[:, STAGE_ENDS]
+    recorded = (starts != 0) & (ends != 0)
+    # Exact integer ns differences, one divide to microseconds
+    latencies = np.where(recorded, (ends - starts) / 1000.0, np.nan)
+    # Cap negative network values at 0, in place on the column view
+    network = latencies[:, STAGE_INDEX["network"]]
+    np.maximum(network, 0.0, out=network)
+    return latencies
+
+
+def check_risk(z_score: float, confidence: float, shares_a: int, shares_b: int) -> bool:
+    """Simulated C++ risk check on the decoded signal fields."""
+    return (
+        confidence >= 0.7 and
+        abs(z_score) <= 3.0 and
+        abs(shares_a) <= 10000 and
+        abs(shares_b) <= 10000
+    )
+
+
+if njit is not None:
+    check_risk = njit(cache=True)(check_risk)
+
+
+def latency_endpoint(transport: str, host: str, port: int) -> str:
+    """Build the ZMQ endpoint for a transport ("inproc", "ipc" or "tcp")."""
+    if transport == "inproc":
+        return f"inproc://latency_{port}"
+    if transport == "ipc":
+        return f"ipc:///tmp/latency_{port}"
+    return f"tcp://{host}:{port}"
+
+
+def latency_socket_types(transport: str) -> Tuple[int, int]:
+    """Get the (sender, receiver) socket types for a transport."""
+    # PUSH/PULL queues losslessly and has no subscription matching. tcp stays
+    # PUB/SUB because the C++ latency test subscribes to the same endpoint.
+    if transport == "tcp":
+        return zmq.PUB, zmq.SUB
+    return zmq.PUSH, zmq.PULL
 
 
 class LatencyTestPublisher:
     """Enhanced signal publisher with latency measurement."""
     
-    def __init__(self, host: str = "localhost", port: int = 5555):
+    def __init__(self, host: str = "localhost", port: int = 5555, transport: str = "inproc",
+                 context: Optional[zmq.Context] = None, capacity: int = 1000):
         self.host = host
         self.port = port
-        self.publisher = SignalPublisher(host, port)
-        self.measurements: List[LatencyMeasurement] = []
-        self.lock = threading.Lock()
-        
-    def connect(self) -> bool:
-        """Connect to ZMQ publisher."""
-        return self.publisher.connect()
-    
-    def disconnect(self):
-        """Disconnect from ZMQ publisher."""
-        self.publisher.disconnect()
-    
-    def send_signal_with_measurement(self, signal_id: str) -> LatencyMeasurement:
-        """Send a test signal with comprehensive latency measurement."""
-        # Python signal generation timing
-        generation_start = time.perf_counter()
-        
-        # Create test signal
-        trade_signal = create_trade_signal(
+        self.publisher = SignalPublisher(
+            host, port, endpoint=latency_endpoint(transport, host, port), context=context,
+            socket_type=latency_socket_types(transport)[0]
+        )
+        # Preallocated rows filled in place, so the send path never allocates or locks
+        self.timestamps = np.zeros((capacity, len(TIMESTAMP_COLUMNS)), dtype=np.int64)
+        self.signal_ids: List[str] = [""] * capacity
+        self.errors: List[Optional[str]] = [None] * capacity
+        self._idx = itertools.count()
+        
+        # The test signal is serialized once; each send only fills in the
+        # fields that change. It stays JSON because the C++ receiver parses JSON.
+        template = create_trade_signal(
             pair_name="TEST_PAIR",
             symbol_a="TEST_A",
             symbol_b="TEST_B",
@@ -156,55 +153,93 @@ class LatencyTestPublisher:
             shares_a=100,
             shares_b=-80,
             volatility=0.25,
-            correlation=0.75
+            correlation=0.75,
+            metadata={"seq": "__seq__"}  # matrix row, so the subscriber can index straight in
         )
+        template.message_id = "__message_id__"
+        template.timestamp = "__timestamp__"
+        self._template = orjson.dumps(template)
         
-        generation_end = time.perf_counter()
-        
-        # Use the actual message_id from the signal
-        actual_signal_id = trade_signal.message_id
-        measurement = LatencyMeasurement(signal_id=actual_signal_id)
-        measurement.python_generation_start = generation_start
-        measurement.python_generation_end = generation_end
-        
-        # Python serialization timing
-        measurement.python_serialization_start = time.perf_counter()
-        signal_dict = trade_signal.to_dict()
-        signal_json = json.dumps(signal_dict)
-        measurement.python_serialization_end = time.perf_counter()
+    def connect(self) -> bool:
+        """Connect to ZMQ publisher."""
+        return self.publisher.connect()
+    
+    def disconnect(self):
+        """Disconnect from ZMQ publisher."""
+        self.publisher.disconnect()
+    
+    def send_signal_with_measurement(self, signal_id: str) -> int:
+        """Send a test signal with comprehensive latency measurement. Returns its row."""
+        row = next(self._idx)
         
-        # Python ZMQ send timing
-        measurement.python_zmq_send_start = time.perf_counter()
-        success = self.publisher.send_trade_signal(trade_signal)
-        measurement.python_zmq_send_end = time.perf_counter()
+        # Python signal generation timing
+        generation_start = time.perf_counter_ns()
+        timestamp = datetime.now(timezone.utc).isoformat()
+        generation_end = time.perf_counter_ns()
+        
+        self.signal_ids[row] = signal_id
+        
+        # Python serialization timing: substitute into the pre-serialized
+        # template, no per-field encoding
+        serialization_start = time.perf_counter_ns()
+        payload = (self._template
+                   .replace(b"__message_id__", signal_id.encode())
+                   .replace(b"__timestamp__", timestamp.encode())
+                   .replace(b'"__seq__"', b"%d" % row))
+        serialization_end = time.perf_counter_ns()
+        
+        # Python ZMQ send timing. Everything up to the send start is stored
+        # before sending, since the subscriber may read it as soon as it arrives.
+        send_start = time.perf_counter_ns()
+        self.timestamps[row, PY_GEN_START:PY_SEND_END] = (
+            generation_start, generation_end, serialization_start, serialization_end, send_start
+        )
+        success = self.publisher.send_encoded("TRADE_SIGNAL", payload)
+        self.timestamps[row, PY_SEND_END] = time.perf_counter_ns()
         
         if not success:
-            measurement.error_message = "Failed to send signal via ZMQ"
+            self.errors[row] = "Failed to send signal via ZMQ"
         
-        # Store measurement
-        with self.lock:
-            self.measurements.append(measurement)
-        
-        return measurement
+        return row
 
 
 class LatencyTestSubscriber:
     """ZMQ subscriber that simulates C++ signal processing with latency measurement."""
     
-    def __init__(self, host: str = "localhost", port: int = 5555):
+    def __init__(self, host: str = "localhost", port: int = 5555, transport: str = "inproc",
+                 context: Optional[zmq.Context] = None, cpu: Optional[int] = None,
+                 simulated_tws_ns: int = 0, debug: bool = False):
         self.host = host
         self.port = port
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.SUB)
-        self.measurements: Dict[str, LatencyMeasurement] = {}
-        self.lock = threading.Lock()
+        self.endpoint = latency_endpoint(transport, host, port)
+        # inproc only works between sockets of the same context, so share the publisher's
+        self.owns_context = context is None
+        self.context = context or zmq.Context(io_threads=2)
+        self.cpu = cpu  # CPU to pin the listening thread to (Linux only)
+        self.simulated_tws_ns = simulated_tws_ns  # 0 measures pure system overhead
+        self.debug = debug  # per-message prints; they distort the timings, so off by default
+        self.socket = self.context.socket(latency_socket_types(transport)[1])
+        self.poller = None
+        # Shared with the publisher (see track_measurements), indexed by the signal's seq
+        self.timestamps: Optional[np.ndarray] = None
+        self.errors: List[Optional[str]] = []
         self.running = False
         self.thread = None
         
     def connect(self):
         """Connect to ZMQ publisher."""
-        self.socket.connect(f"tcp://{self.host}:{self.port}")
-        self.socket.setsockopt_string(zmq.SUBSCRIBE, "TRADE_SIGNAL")
+        self.socket.setsockopt(zmq.RCVHWM, 10000)
+        self.socket.setsockopt(zmq.RCVBUF, 1 << 20)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.setsockopt(zmq.IMMEDIATE, 1)
+        self.socket.setsockopt(zmq.RCVTIMEO, 100)  # safety net; the loop polls and receives non-blocking
+        if self.endpoint.startswith("tcp://"):
+            self.socket.setsockopt(zmq.TCP_KEEPALIVE, 1)
+        self.socket.connect(self.endpoint)
+        if self.socket.socket_type == zmq.SUB:
+            self.socket.setsockopt_string(zmq.SUBSCRIBE, "TRADE_SIGNAL")
+        self.poller = zmq.Poller()
+        self.poller.register(self.socket, zmq.POLLIN)
         
     def disconnect(self):
         """Disconnect from ZMQ publisher."""
@@ -212,7 +247,8 @@ class LatencyTestSubscriber:
         if self.thread:
             self.thread.join()
         self.socket.close()
-        self.context.term()
+        if self.owns_context:
+            self.context.term()
     
     def start_listening(self):
         """Start listening for signals in a separate thread."""
@@ -222,53 +258,61 @@ class LatencyTestSubscriber:
     
     def _listen_loop(self):
         """Main listening loop that simulates C++ processing."""
+        if self.cpu is not None and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, {self.cpu})  # pid 0 pins only this thread
+        check_risk(0.0, 1.0, 0, 0)  # compile (when numba is present) before the first timed call
         print("Subscriber listening loop started")
+        draining = False
         while self.running:
             try:
-                # Set timeout for non-blocking receive
-                self.socket.setsockopt(zmq.RCVTIMEO, 100)  # 100ms timeout
+                # Poll (100ms, so running=False is noticed) only once the queue is
+                # empty; while messages are waiting go straight to a non-blocking recv
+                if not draining and not self.poller.poll(100):
+                    continue
                 
                 # C++ receive start timing
-                receive_start = time.perf_counter()
+                receive_start = time.perf_counter_ns()
                 
-                topic = self.socket.recv_string()
-                message = self.socket.recv_json()
+                # Zero-copy frames; orjson parses straight from libzmq's buffer
+                topic, payload = self.socket.recv_multipart(zmq.NOBLOCK, copy=False)
+                draining = True
+                if topic.bytes != b"TRADE_SIGNAL":
+                    continue  # PULL has no subscription filter; skip the publisher's heartbeats
+                message = orjson.loads(payload.buffer)
                 
-                receive_end = time.perf_counter()
+                receive_end = time.perf_counter_ns()
                 
-                print(f"Received message: {topic} - {message.get('message_id', 'unknown')}")
+                # Extract signal ID and matrix row from message
+                signal_id = message["message_id"]
+                seq = message["metadata"]["seq"]
                 
-                # Extract signal ID from message
-                signal_id = message.get("message_id", "unknown")
+                if self.debug:
+                    print(f"Received message: {topic.bytes.decode()} - {signal_id}")
                 
                 # C++ parsing timing
-                parsing_start = time.perf_counter()
+                parsing_start = time.perf_counter_ns()
                 
-                # Simulate JSON parsing (like C++ signal parser)
-                pair_name = message.get("pair_name", "")
-                signal_type = message.get("signal_type", "")
-                z_score = message.get("z_score", 0.0)
-                confidence = message.get("confidence", 0.0)
-                shares_a = message.get("shares_a", 0)
-                shares_b = message.get("shares_b", 0)
+                # Simulate JSON parsing (like C++ signal parser). Every field is
+                # required by TradeSignal, so index directly with no defaults.
+                pair_name = message["pair_name"]
+                signal_type = message["signal_type"]
+                z_score = message["z_score"]
+                confidence = message["confidence"]
+                shares_a = message["shares_a"]
+                shares_b = message["shares_b"]
                 
-                parsing_end = time.perf_counter()
+                parsing_end = time.perf_counter_ns()
                 
                 # C++ risk check timing
-                risk_check_start = time.perf_counter()
+                risk_check_start = time.perf_counter_ns()
                 
                 # Simulate risk checking (like C++ risk checker)
-                risk_passed = (
-                    confidence >= 0.7 and
-                    abs(z_score) <= 3.0 and
-                    abs(shares_a) <= 10000 and
-                    abs(shares_b) <= 10000
-                )
+                risk_passed = check_risk(z_score, confidence, shares_a, shares_b)
                 
-                risk_check_end = time.perf_counter()
+                risk_check_end = time.perf_counter_ns()
                 
                 # C++ order creation timing
-                order_creation_start = time.perf_counter()
+                order_creation_start = time.perf_counter_ns()
                 
                 # Simulate order creation (like C++ order manager)
                 if risk_passed:
@@ -285,138 +329,117 @@ class LatencyTestSubscriber:
                         "orderType": "MKT"
                     }
                 
-                order_creation_end = time.perf_counter()
+                order_creation_end = time.perf_counter_ns()
                 
                 # C++ TWS submission timing
-                tws_submit_start = time.perf_counter()
+                tws_submit_start = time.perf_counter_ns()
+                
+                # Simulate TWS submission (network delay + processing). Spin rather
+                # than sleep(): sleep rounds up to the OS timer (1-15 ms on Windows).
+                if self.simulated_tws_ns:
+                    deadline = time.perf_counter_ns() + self.simulated_tws_ns
+                    while time.perf_counter_ns() < deadline:
+                        time.sleep(0)  # yield the GIL/core without a timer wait
+                
+                tws_submit_end = time.perf_counter_ns()
                 
-                # Simulate TWS submission (network delay + processing)
-                time.sleep(0.005)  # Simulate 5ms TWS processing
+                # Update measurement with C++ timings: all C++ columns of the signal's
+                # row in one store. Each row is written by the publisher before the
+                # send and by this thread after it, so no lock.
+                self.timestamps[seq, CPP_RECV_START:] = (
+                    receive_start, receive_end, parsing_start, parsing_end,
+                    risk_check_start, risk_check_end, order_creation_start, order_creation_end,
+                    tws_submit_start, tws_submit_end
+                )
                 
-                tws_submit_end = time.perf_counter()
+                if not risk_passed:
+                    self.errors[seq] = "Risk check failed"
                 
-                # Update measurement with C++ timings
-                with self.lock:
-                    if signal_id in self.measurements:
-                        measurement = self.measurements[signal_id]
-                        measurement.cpp_receive_start = receive_start
-                        measurement.cpp_receive_end = receive_end
-                        measurement.cpp_parsing_start = parsing_start
-                        measurement.cpp_parsing_end = parsing_end
-                        measurement.cpp_risk_check_start = risk_check_start
-                        measurement.cpp_risk_check_end = risk_check_end
-                        measurement.cpp_order_creation_start = order_creation_start
-                        measurement.cpp_order_creation_end = order_creation_end
-                        measurement.cpp_tws_submit_start = tws_submit_start
-                        measurement.cpp_tws_submit_end = tws_submit_end
-                        
-                        if not risk_passed:
-                            measurement.error_message = "Risk check failed"
-                        
-                        # Debug timing
-                        network_latency = (receive_start - measurement.python_zmq_send_start) * 1_000_000
-                        corrected_latency = max(0, network_latency)
-                        print(f"Updated measurement for signal {signal_id}")
-                        print(f"  Python ZMQ Send Start: {measurement.python_zmq_send_start:.6f}")
-                        print(f"  C++ Receive Start:     {receive_start:.6f}")
-                        print(f"  Raw Network Latency:   {network_latency:.2f} us")
-                        print(f"  Corrected Latency:     {corrected_latency:.2f} us")
-                    else:
-                        print(f"Warning: No measurement found for signal {signal_id}")
+                # Debug timing
+                if self.debug:
+                    send_start = self.timestamps[seq, PY_SEND_START]
+                    network_latency = (receive_start - send_start) / 1000.0
+                    corrected_latency = max(0, network_latency)
+                    print(f"Updated measurement for signal {signal_id}")
+                    print(f"  Python ZMQ Send Start: {send_start} ns")
+                    print(f"  C++ Receive Start:     {receive_start} ns")
+                    print(f"  Raw Network Latency:   {network_latency:.2f} us")
+                    print(f"  Corrected Latency:     {corrected_latency:.2f} us")
                 
             except zmq.Again:
-                # Timeout - continue listening
+                # Queue drained - back to polling
+                draining = False
                 continue
             except Exception as e:
                 print(f"Error in listening loop: {e}")
                 break
     
-    def add_measurement(self, measurement: LatencyMeasurement):
-        """Add a measurement to track."""
-        with self.lock:
-            self.measurements[measurement.signal_id] = measurement
+    def track_measurements(self, timestamps: np.ndarray, errors: List[Optional[str]]):
+        """Share the publisher's preallocated timestamp matrix and error list."""
+        self.timestamps = timestamps
+        self.errors = errors
 
 
 class LatencyAnalyzer:
     """Analyzes latency measurements and generates reports."""
     
     def __init__(self):
-        self.measurements: List[LatencyMeasurement] = []
-        
-    def add_measurements(self, measurements: List[LatencyMeasurement]):
-        """Add measurements for analysis."""
-        self.measurements.extend(measurements)
+        self.timestamps = np.empty((0, len(TIMESTAMP_COLUMNS)), dtype=np.int64)
+        self._latency_matrix = np.empty((0, len(LATENCY_STAGES)))
     
-    def calculate_statistics(self, latencies: List[float]) -> Dict[str, float]:
-        """Calculate statistical measures for a list of latencies."""
-        if not latencies:
-            return {}
-        
-        return {
-            "count": len(latencies),
-            "mean": statistics.mean(latencies),
-            "median": statistics.median(latencies),
-            "std": statistics.stdev(latencies) if len(latencies) > 1 else 0,
-            "min": min(latencies),
-            "max": max(latencies),
-            "p50": np.percentile(latencies, 50),
-            "p90": np.percentile(latencies, 90),
-            "p95": np.percentile(latencies, 95),
-            "p99": np.percentile(latencies, 99),
-            "p99.9": np.percentile(latencies, 99.9)
-        }
+    @property
+    def latency_matrix(self) -> np.ndarray:
+        """(N, stages) latencies in microseconds, columns in LATENCY_STAGES order."""
+        return self._latency_matrix
+        
+    def add_measurements(self, timestamps: np.ndarray):
+        """Add rows of the timestamp matrix for analysis."""
+        # Stage latencies are derived once here and shared by the report, plots and results
+        latencies = stage_latency_matrix(timestamps)
+        # The first batch is kept as-is rather than copied by vstack
+        if len(self.timestamps):
+            self.timestamps = np.vstack((self.timestamps, timestamps))
+            self._latency_matrix = np.vstack((self._latency_matrix, latencies))
+        else:
+            self.timestamps = timestamps
+            self._latency_matrix = latencies
+    
+    def calculate_statistics(self, latencies: np.ndarray) -> Dict[str, np.ndarray]:
+        """Calculate statistical measures for each column of an (N, stages) latency matrix."""
+        latencies = np.asarray(latencies, dtype=np.float64)
+        counts = np.count_nonzero(~np.isnan(latencies), axis=0)
+        
+        # NaN marks an unrecorded stage; all-NaN columns are dropped by the caller
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            p50, p90, p95, p99, p999 = np.nanquantile(latencies, [0.5, 0.9, 0.95, 0.99, 0.999], axis=0)
+            stds = np.nanstd(latencies, axis=0, ddof=1)
+            return {
+                "count": counts,
+                "mean": np.nanmean(latencies, axis=0),
+                "median": p50,
+                "std": np.where(counts > 1, stds, 0.0),
+                "min": np.nanmin(latencies, axis=0),
+                "max": np.nanmax(latencies, axis=0),
+                "p50": p50,
+                "p90": p90,
+                "p95": p95,
+                "p99": p99,
+                "p99.9": p999
+            }
     
     def generate_latency_report(self) -> Dict[str, Dict[str, float]]:
         """Generate comprehensive latency report."""
-        report = {}
-        
-        # Python generation latency
-        python_gen_latencies = [m.get_python_generation_latency() for m in self.measurements]
-        report["python_generation"] = self.calculate_statistics(python_gen_latencies)
-        
-        # Python serialization latency
-        python_serial_latencies = [m.get_python_serialization_latency() for m in self.measurements]
-        report["python_serialization"] = self.calculate_statistics(python_serial_latencies)
-        
-        # Python ZMQ latency
-        python_zmq_latencies = [m.get_python_zmq_latency() for m in self.measurements]
-        report["python_zmq"] = self.calculate_statistics(python_zmq_latencies)
-        
-        # Total Python latency
-        python_total_latencies = [m.get_total_python_latency() for m in self.measurements]
-        report["python_total"] = self.calculate_statistics(python_total_latencies)
-        
-        # Network latency (Python ZMQ send to C++ receive)
-        network_latencies = [m.get_network_latency() for m in self.measurements if m.get_network_latency() is not None]
-        report["network"] = self.calculate_statistics(network_latencies)
+        report = {stage: {} for stage in LATENCY_STAGES}
+        if not len(self.latency_matrix):
+            return report
         
-        # C++ receive latency
-        cpp_receive_latencies = [m.get_cpp_receive_latency() for m in self.measurements if m.get_cpp_receive_latency() is not None]
-        report["cpp_receive"] = self.calculate_statistics(cpp_receive_latencies)
+        # One column per stage, so each statistic is a single array op over all stages
+        stats = self.calculate_statistics(self.latency_matrix)
         
-        # C++ parsing latency
-        cpp_parsing_latencies = [m.get_cpp_parsing_latency() for m in self.measurements if m.get_cpp_parsing_latency() is not None]
-        report["cpp_parsing"] = self.calculate_statistics(cpp_parsing_latencies)
-        
-        # C++ risk check latency
-        cpp_risk_latencies = [m.get_cpp_risk_check_latency() for m in self.measurements if m.get_cpp_risk_check_latency() is not None]
-        report["cpp_risk_check"] = self.calculate_statistics(cpp_risk_latencies)
-        
-        # C++ order creation latency
-        cpp_order_latencies = [m.get_cpp_order_creation_latency() for m in self.measurements if m.get_cpp_order_creation_latency() is not None]
-        report["cpp_order_creation"] = self.calculate_statistics(cpp_order_latencies)
-        
-        # C++ TWS latency
-        cpp_tws_latencies = [m.get_cpp_tws_latency() for m in self.measurements if m.get_cpp_tws_latency() is not None]
-        report["cpp_tws"] = self.calculate_statistics(cpp_tws_latencies)
-        
-        # Total C++ latency
-        cpp_total_latencies = [m.get_total_cpp_latency() for m in self.measurements if m.get_total_cpp_latency() is not None]
-        report["cpp_total"] = self.calculate_statistics(cpp_total_latencies)
-        
-        # End-to-end latency
-        e2e_latencies = [m.get_end_to_end_latency() for m in self.measurements if m.get_end_to_end_latency() is not None]
-        report["end_to_end"] = self.calculate_statistics(e2e_latencies)
+        for i, stage in enumerate(LATENCY_STAGES):
+            if stats["count"][i]:
+                report[stage] = {name: values[i].item() for name, values in stats.items()}
         
         return report
     
@@ -485,6 +508,12 @@ class LatencyAnalyzer:
     def create_latency_plots(self, report: Dict[str, Dict[str, float]], save_path: str = "latency_analysis.png"):
         """Create latency visualization plots."""
         try:
+            # Imported here: plotting is the only user, and the file-only Agg
+            # backend skips GUI toolkit initialisation
+            import matplotlib
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+            
             # Prepare data for plotting
             stages = []
             means = []
@@ -519,12 +548,15 @@ class LatencyAnalyzer:
             ax2.legend()
             
             # Plot 3: End-to-end latency distribution
-            e2e_latencies = [m.get_end_to_end_latency() for m in self.measurements if m.get_end_to_end_latency() is not None]
-            if e2e_latencies:
+            e2e_latencies = self.latency_matrix[:, STAGE_INDEX["end_to_end"]]
+            e2e_latencies = e2e_latencies[~np.isnan(e2e_latencies)]
+            if e2e_latencies.size:
                 ax3.hist(e2e_latencies, bins=50, color='gold', alpha=0.7, edgecolor='black')
-                ax3.axvline(np.mean(e2e_latencies), color='red', linestyle='--', label=f'Mean: {np.mean(e2e_latencies):.2f} us')
-                ax3.axvline(np.percentile(e2e_latencies, 95), color='orange', linestyle='--', label=f'P95: {np.percentile(e2e_latencies, 95):.2f} us')
-                ax3.axvline(np.percentile(e2e_latencies, 99), color='purple', linestyle='--', label=f'P99: {np.percentile(e2e_latencies, 99):.2f} us')
+                # Same data as the report's end_to_end row, so reuse its statistics
+                e2e_stats = report["end_to_end"]
+                ax3.axvline(e2e_stats['mean'], color='red', linestyle='--', label=f"Mean: {e2e_stats['mean']:.2f} us")
+                ax3.axvline(e2e_stats['p95'], color='orange', linestyle='--', label=f"P95: {e2e_stats['p95']:.2f} us")
+                ax3.axvline(e2e_stats['p99'], color='purple', linestyle='--', label=f"P99: {e2e_stats['p99']:.2f} us")
                 ax3.set_title('End-to-End Latency Distribution', fontsize=14, fontweight='bold')
                 ax3.set_xlabel('Latency (us)')
                 ax3.set_ylabel('Frequency')
@@ -549,26 +581,57 @@ class LatencyAnalyzer:
             print(f"Warning: Could not create latency plots: {e}")
 
 
-def run_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int = 5555):
-    """Run comprehensive latency measurement test."""
+def _split_cpus() -> Tuple[Optional[int], Optional[set]]:
+    """Pick a dedicated CPU for the listener and the remaining CPUs for the sender."""
+    if not hasattr(os, "sched_getaffinity"):
+        return None, None
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < 2:
+        return None, None
+    return cpus[-1], set(cpus[:-1])
+
+
+def run_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int = 5555,
+                     transport: str = "inproc", simulated_tws_ms: float = 0.0,
+                     debug: bool = False, save_results: bool = True) -> bool:
+    """Run comprehensive latency measurement test. Returns True if the test ran to completion.
+    
+    transport="inproc" measures the Python side alone; use "tcp" when an external
+    receiver (the C++ latency test) has to see the signals too. save_results=False
+    skips the plots and the results file, e.g. for a warmup run.
+    
+    On Linux the listener and sender are pinned to separate CPUs; for the least
+    jitter also run the process in the real-time class, e.g. `chrt -f 50 python ...`.
+    """
     print("Starting End-to-End Latency Test")
     print(f"   Signals: {num_signals}")
     print(f"   Delay: {delay_ms}ms between signals")
     print(f"   Port: {port}")
+    print(f"   Transport: {transport}")
+    print(f"   Simulated TWS: {simulated_tws_ms}ms")
     
-    # Initialize components
-    publisher = LatencyTestPublisher(port=port)
-    subscriber = LatencyTestSubscriber(port=port)
+    # Initialize components on one shared context. The I/O threads start here,
+    # before the sender is pinned, so they keep the full CPU set.
+    context = zmq.Context(io_threads=2)
+    listener_cpu, sender_cpus = _split_cpus()
+    publisher = LatencyTestPublisher(port=port, transport=transport, context=context, capacity=num_signals)
+    subscriber = LatencyTestSubscriber(port=port, transport=transport, context=context, cpu=listener_cpu,
+                                       simulated_tws_ns=int(simulated_tws_ms * 1_000_000), debug=debug)
     analyzer = LatencyAnalyzer()
+    original_cpus = os.sched_getaffinity(0) if sender_cpus else None
     
     try:
+        if sender_cpus:
+            os.sched_setaffinity(0, sender_cpus)
+        
         # Connect components
         print("\nConnecting components...")
         if not publisher.connect():
             print("Failed to connect publisher")
-            return
+            return False
         
         subscriber.connect()
+        subscriber.track_measurements(publisher.timestamps, publisher.errors)
         subscriber.start_listening()
         
         # Wait for connection to stabilize and subscriber to start listening
@@ -576,24 +639,31 @@ def run_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int =
         time.sleep(1.0)
         
         print(f"\nSending {num_signals} test signals...")
-        start_time = time.time()
+        period_ns = int(delay_ms * 1_000_000)
+        start_ns = time.perf_counter_ns()
+        next_send_ns = start_ns
         
         # Send test signals
         for i in range(num_signals):
-            signal_id = f"test_signal_{i:06d}"
-            measurement = publisher.send_signal_with_measurement(signal_id)
+            # Pace on a fixed schedule: sleep() overshoots by the OS timer
+            # granularity, so spin to each deadline, yielding while it's far off.
+            # Deadlines advance by the period, so a late send doesn't shift the rest.
+            while True:
+                remaining_ns = next_send_ns - time.perf_counter_ns()
+                if remaining_ns <= 0:
+                    break
+                if remaining_ns > 100_000:
+                    time.sleep(0)
+            next_send_ns += period_ns
             
-            # Add measurement to subscriber for tracking
-            subscriber.add_measurement(measurement)
+            signal_id = f"test_signal_{i:06d}"
+            publisher.send_signal_with_measurement(signal_id)
             
             # Progress indicator
             if (i + 1) % 100 == 0:
-                elapsed = time.time() - start_time
+                elapsed = (time.perf_counter_ns() - start_ns) / 1e9
                 rate = (i + 1) / elapsed
                 print(f"   Sent {i + 1}/{num_signals} signals ({rate:.1f} signals/sec)")
-            
-            # Delay between signals
-            time.sleep(delay_ms / 1000.0)
         
         # Wait for all signals to be processed
         print(f"\nWaiting for signal processing to complete...")
@@ -601,25 +671,22 @@ def run_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int =
         
         # Collect measurements
         print(f"\nCollecting measurements...")
-        all_measurements = publisher.measurements + list(subscriber.measurements.values())
-        
-        # Remove duplicates and filter valid measurements
-        unique_measurements = {}
-        for measurement in all_measurements:
-            if measurement.signal_id not in unique_measurements:
-                unique_measurements[measurement.signal_id] = measurement
+        # Rows the subscriber completed: one mask over the shared matrix, no merging
+        valid = publisher.timestamps[:, CPP_TWS_END] != 0
+        valid_timestamps = publisher.timestamps[valid]
         
-        valid_measurements = [m for m in unique_measurements.values() if m.get_end_to_end_latency() is not None]
-        
-        print(f"   Total measurements: {len(all_measurements)}")
-        print(f"   Valid measurements: {len(valid_measurements)}")
-        print(f"   Success rate: {len(valid_measurements)/num_signals*100:.1f}%")
+        print(f"   Total measurements: {num_signals}")
+        print(f"   Valid measurements: {len(valid_timestamps)}")
+        print(f"   Success rate: {len(valid_timestamps)/num_signals*100:.1f}%")
         
         # Analyze results
-        analyzer.add_measurements(valid_measurements)
+        analyzer.add_measurements(valid_timestamps)
         report = analyzer.generate_latency_report()
         analyzer.print_latency_report(report)
         
+        if not save_results:
+            return True
+        
         # Create visualizations
         analyzer.create_latency_plots(report)
         
@@ -627,28 +694,19 @@ def run_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int =
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         results_file = f"latency_test_results_{timestamp}.json"
         
-        # Convert measurements to serializable format
+        # Convert measurements to serializable format from the analyzer's latency rows
+        result_keys = [RESULT_KEYS.get(stage, f"{stage}_latency") for stage in LATENCY_STAGES]
         serializable_measurements = []
-        for measurement in valid_measurements:
-            serializable_measurements.append({
-                "signal_id": measurement.signal_id,
-                "python_generation_latency": measurement.get_python_generation_latency(),
-                "python_serialization_latency": measurement.get_python_serialization_latency(),
-                "python_zmq_latency": measurement.get_python_zmq_latency(),
-                "network_latency": measurement.get_network_latency(),
-                "cpp_receive_latency": measurement.get_cpp_receive_latency(),
-                "cpp_parsing_latency": measurement.get_cpp_parsing_latency(),
-                "cpp_risk_check_latency": measurement.get_cpp_risk_check_latency(),
-                "cpp_order_creation_latency": measurement.get_cpp_order_creation_latency(),
-                "cpp_tws_latency": measurement.get_cpp_tws_latency(),
-                "total_python_latency": measurement.get_total_python_latency(),
-                "total_cpp_latency": measurement.get_total_cpp_latency(),
-                "end_to_end_latency": measurement.get_end_to_end_latency(),
-                "error_message": measurement.error_message
-            })
-        
-        with open(results_file, 'w') as f:
-            json.dump({
+        valid_ids = itertools.compress(publisher.signal_ids, valid)
+        valid_errors = itertools.compress(publisher.errors, valid)
+        for signal_id, error_message, row in zip(valid_ids, valid_errors, analyzer.latency_matrix.tolist()):
+            measurement = {"signal_id": signal_id}
+            measurement.update(zip(result_keys, row))
+            measurement["error_message"] = error_message
+            serializable_measurements.append(measurement)
+        
+        with open(results_file, 'wb') as f:
+            f.write(orjson.dumps({
                 "test_config": {
                     "num_signals": num_signals,
                     "delay_ms": delay_ms,
@@ -657,19 +715,25 @@ def run_latency_test(num_signals: int = 1000, delay_ms: float = 1.0, port: int =
                 },
                 "summary": report,
                 "measurements": serializable_measurements
-            }, f, indent=2)
+            }, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
         
         print(f"\nDetailed results saved to: {results_file}")
+        return True
         
     except KeyboardInterrupt:
         print("\nTest interrupted by user")
+        return False
     except Exception as e:
         print(f"\nTest failed with error: {e}")
+        return False
     finally:
         # Cleanup
         print("\nCleaning up...")
         publisher.disconnect()
         subscriber.disconnect()
+        context.term()
+        if original_cpus:
+            os.sched_setaffinity(0, original_cpus)
 
 
 if __name__ == "__main__":
@@ -679,11 +743,20 @@ if __name__ == "__main__":
     parser.add_argument("--signals", type=int, default=1000, help="Number of signals to send")
     parser.add_argument("--delay", type=float, default=1.0, help="Delay between signals in milliseconds")
     parser.add_argument("--port", type=int, default=5555, help="ZMQ port to use")
+    parser.add_argument("--transport", choices=["inproc", "ipc", "tcp"], default="inproc",
+                        help="ZMQ transport between publisher and subscriber")
+    parser.add_argument("--tws-ms", type=float, default=0.0,
+                        help="Simulated TWS submission time in milliseconds (0 = none)")
+    parser.add_argument("--debug", action="store_true", help="Print every received message")
     
     args = parser.parse_args()
     
-    run_latency_test(
+    success = run_latency_test(
         num_signals=args.signals,
         delay_ms=args.delay,
-        port=args.port
-    ) 
\ No newline at end of file
+        port=args.port,
+        transport=args.transport,
+        simulated_tws_ms=args.tws_ms,
+        debug=args.debug
+    )
+    sys.exit(0 if success else 1)
@@ -4,32 +4,70 @@ Python test runner for the pairs trading system.
 Runs all Python tests and provides a comprehensive report.
 """
 
-import unittest
 import sys
 import os
 import time
+import subprocess
+import tempfile
+import importlib.util
+import xml.etree.ElementTree as ET
 from datetime import datetime
 
 # Add the python directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'python'))
 
+class JUnitResult:
+    """Test counts and failure details read from a pytest JUnit XML report."""
+    
+    def __init__(self, junit_path: str):
+        self.testsRun = 0
+        self.failures = []
+        self.errors = []
+        self.skipped = []
+        
+        for case in ET.parse(junit_path).getroot().iter("testcase"):
+            self.testsRun += 1
+            name = f"{case.get('name')} ({case.get('classname')})"
+            failure = case.find("failure")
+            error = case.find("error")
+            skipped = case.find("skipped")
+            if failure is not None:
+                self.failures.append((name, failure.text or failure.get("message", "")))
+            elif error is not None:
+                self.errors.append((name, error.text or error.get("message", "")))
+            elif skipped is not None:
+                self.skipped.append((name, skipped.get("message", "")))
+
 def run_test_suite():
     """Run all Python tests and return results."""
     print("Running Python Tests for Pairs Trading System")
     print("=" * 60)
     
-    # Discover and run tests
-    loader = unittest.TestLoader()
-    start_dir = os.path.dirname(__file__)
-    suite = loader.discover(start_dir, pattern='test_*.py')
-    
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
-    start_time = time.time()
-    result = runner.run(suite)
-    end_time = time.time()
-    
-    return result, end_time - start_time
+    start_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # A fresh directory per run, so a report left by an earlier run is never read
+    with tempfile.TemporaryDirectory() as report_dir:
+        junit_path = os.path.join(report_dir, "python_tests.xml")
+        command = [sys.executable, "-m", "pytest", start_dir, "-q", f"--junitxml={junit_path}"]
+        # pytest-xdist is optional; without it the suite runs in a single process
+        if importlib.util.find_spec("xdist") is not None:
+            # One worker per core; loadscope keeps each TestCase class on a single
+            # worker so tests sharing ZMQ setup don't collide on ports
+            command += ["-n", "auto", "--dist=loadscope"]
+        
+        # Run tests
+        start_time = time.perf_counter()
+        completed = subprocess.run(command)
+        end_time = time.perf_counter()
+        
+        # 0: all passed, 1: some tests failed, 5: no tests collected. Anything
+        # else is an interrupted run, internal error or usage error.
+        if completed.returncode not in (0, 1, 5):
+            raise RuntimeError(f"pytest exited with code {completed.returncode}")
+        if not os.path.exists(junit_path):
+            raise RuntimeError("pytest did not write a test report")
+        
+        return JUnitResult(junit_path), end_time - start_time
 
 def print_summary(result, duration):
     """Print test summary."""
@@ -40,25 +78,28 @@ def print_summary(result, duration):
     total_tests = result.testsRun
     failures = len(result.failures)
     errors = len(result.errors)
-    passed = total_tests - failures - errors
-    success_rate = (passed / total_tests * 100) if total_tests > 0 else 0
+    skipped = len(result.skipped)
+    passed = total_tests - failures - errors - skipped
+    executed = total_tests - skipped
+    success_rate = (passed / executed * 100) if executed > 0 else 0
     
     print(f"Duration: {duration:.2f} seconds")
     print(f"Total Tests: {total_tests}")
     print(f"Passed: {passed}")
     print(f"Failures: {failures}")
     print(f"Errors: {errors}")
+    print(f"Skipped: {skipped}")
     print(f"Success Rate: {success_rate:.1f}%")
     
     if failures > 0:
         print(f"\nFAILURES ({failures}):")
         for test, traceback in result.failures:
-            print(f"  • {test}: {traceback.split('AssertionError:')[-1].strip()}")
+            print(f"  • {test}: {traceback.rpartition('AssertionError:')[2].strip()}")
     
     if errors > 0:
         print(f"\nERRORS ({errors}):")
         for test, traceback in result.errors:
-            print(f"  • {test}: {traceback.split('Exception:')[-1].strip()}")
+            print(f"  • {test}: {traceback.rpartition('Exception:')[2].strip()}")
     
     print("\n" + "=" * 60)
     
@@ -79,17 +120,17 @@ def check_dependencies():
     print("🔍 Checking Python Dependencies...")
     
     required_packages = [
-        'numpy', 'pandas', 'zmq', 'yaml', 'unittest',
+        'numpy', 'pandas', 'zmq', 'orjson', 'yaml', 'unittest', 'pytest',
         'pykalman', 'statsmodels', 'yfinance'
     ]
     
     missing_packages = []
     
+    # find_spec only locates each package; nothing is imported
     for package in required_packages:
-        try:
-            __import__(package)
+        if importlib.util.find_spec(package) is not None:
             print(f"  {package}")
-        except ImportError:
+        else:
             print(f"  {package} - MISSING")
             missing_packages.append(package)
     
@@ -12,16 +12,17 @@ import os
 # Add the python directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'python'))
 
-from strategy.kalman_filter import PairsKalmanFilter, PairsTradingStrategy
+# strategy.kalman_filter pulls in pykalman and statsmodels, so it is imported
+# where the tests use it rather than at collection time
 
 
 class TestPairsKalmanFilter(unittest.TestCase):
     """Test cases for PairsKalmanFilter class."""
     
-    def setUp(self):
-        """Set up test data."""
+    @classmethod
+    def setUpClass(cls):
+        """Set up test data once; the price series are read-only."""
         # Create synthetic price data for testing
-        np.random.seed(42)
         n_points = 100
         
         # Generate correlated price series
@@ -30,20 +31,32 @@ class TestPairsKalmanFilter(unittest.TestCase):
         
         # Create trend with some correlation
         trend = np.linspace(0, 10, n_points)
-        noise_a = np.random.normal(0, 1, n_points)
-        noise_b = np.random.normal(0, 0.5, n_points)
-        
-        # Correlated price movements
-        price_a = base_price_a + trend + noise_a
-        price_b = base_price_b + 0.5 * trend + noise_b
+        # Both noise series in one draw from a local generator
+        noise = np.random.default_rng(42).standard_normal((2, n_points))
+        noise[1] *= 0.5
+        noise_a, noise_b = noise
+        
+        # Correlated price movements, one allocation per series
+        price_a = np.add(trend, base_price_a)
+        price_a += noise_a
+        price_b = np.multiply(trend, 0.5)
+        price_b += base_price_b
+        price_b += noise_b
         
         # Add some mean reversion to create trading opportunities
-        spread = price_a - 2 * price_b
-        mean_reversion = -0.1 * (spread - np.mean(spread))
+        mean_reversion = np.multiply(price_b, -2.0)
+        mean_reversion += price_a  # spread = price_a - 2 * price_b
+        mean_reversion -= mean_reversion.mean()
+        mean_reversion *= -0.1
         price_a += mean_reversion
         
-        self.price_a = pd.Series(price_a, index=pd.date_range('2024-01-01', periods=n_points, freq='D'))
-        self.price_b = pd.Series(price_b, index=pd.date_range('2024-01-01', periods=n_points, freq='D'))
+        index = pd.date_range('2024-01-01', periods=n_points, freq='D')
+        cls.price_a = pd.Series(price_a, index=index)
+        cls.price_b = pd.Series(price_b, index=index)
+    
+    def setUp(self):
+        """Create a fresh filter for each test."""
+        from strategy.kalman_filter import PairsKalmanFilter
         
         # Initialize Kalman Filter
         self.kf = PairsKalmanFilter(
@@ -113,6 +126,29 @@ class TestPairsKalmanFilter(unittest.TestCase):
         self.assertGreater(z_score, -10.0)
         self.assertLess(z_score, 10.0)
     
+    def test_update_step_matches_matrix_form(self):
+        """Test the (possibly compiled) update step against the matrix formulation over many steps."""
+        from strategy.kalman_filter import _kf_step
+        
+        q, r = self.kf.transition_covariance, self.kf.observation_covariance
+        x, P = np.zeros(2), np.eye(2)
+        expected_x, expected_P = x.copy(), P.copy()
+        
+        # Covariance is carried forward, so compare after every step to catch drift
+        for log_a, log_b in zip(np.log(self.price_a.values), np.log(self.price_b.values)):
+            x, P, spread, forecast_variance = _kf_step(x, P, log_b, q, r, log_a)
+            
+            H = np.array([[1.0, log_b]])
+            predicted_P = expected_P + np.eye(2) * q
+            gain = predicted_P @ H.T / (H @ predicted_P @ H.T + r)
+            expected_x = expected_x + gain.ravel() * (log_a - (H @ expected_x)[0])
+            expected_P = (np.eye(2) - gain @ H) @ predicted_P
+            
+            np.testing.assert_allclose(x, expected_x, rtol=1e-9, atol=1e-12)
+            np.testing.assert_allclose(P, expected_P, rtol=1e-9, atol=1e-12)
+            self.assertAlmostEqual(spread, log_a - (H @ expected_x)[0], places=12)
+            self.assertAlmostEqual(forecast_variance, (H @ expected_P @ H.T)[0, 0] + r, places=12)
+    
     def test_update_without_initialization(self):
         """Test update without prior initialization."""
         with self.assertRaises(RuntimeError):
@@ -161,29 +197,41 @@ class TestPairsKalmanFilter(unittest.TestCase):
 class TestPairsTradingStrategy(unittest.TestCase):
     """Test cases for PairsTradingStrategy class."""
     
-    def setUp(self):
-        """Set up test data."""
+    @classmethod
+    def setUpClass(cls):
+        """Set up test data once; the price series are read-only."""
         # Create synthetic price data
-        np.random.seed(42)
         n_points = 100
         
         base_price_a = 100.0
         base_price_b = 50.0
         
         trend = np.linspace(0, 10, n_points)
-        noise_a = np.random.normal(0, 1, n_points)
-        noise_b = np.random.normal(0, 0.5, n_points)
+        # Both noise series in one draw from a local generator
+        noise = np.random.default_rng(42).standard_normal((2, n_points))
+        noise[1] *= 0.5
+        noise_a, noise_b = noise
         
-        price_a = base_price_a + trend + noise_a
-        price_b = base_price_b + 0.5 * trend + noise_b
+        price_a = np.add(trend, base_price_a)
+        price_a += noise_a
+        price_b = np.multiply(trend, 0.5)
+        price_b += base_price_b
+        price_b += noise_b
         
         # Add mean reversion
-        spread = price_a - 2 * price_b
-        mean_reversion = -0.1 * (spread - np.mean(spread))
+        mean_reversion = np.multiply(price_b, -2.0)
+        mean_reversion += price_a  # spread = price_a - 2 * price_b
+        mean_reversion -= mean_reversion.mean()
+        mean_reversion *= -0.1
         price_a += mean_reversion
         
-        self.price_a = pd.Series(price_a, index=pd.date_range('2024-01-01', periods=n_points, freq='D'))
-        self.price_b = pd.Series(price_b, index=pd.date_range('2024-01-01', periods=n_points, freq='D'))
+        index = pd.date_range('2024-01-01', periods=n_points, freq='D')
+        cls.price_a = pd.Series(price_a, index=index)
+        cls.price_b = pd.Series(price_b, index=index)
+    
+    def setUp(self):
+        """Create a fresh strategy for each test."""
+        from strategy.kalman_filter import PairsTradingStrategy
         
         # Initialize strategy
         self.strategy = PairsTradingStrategy(
@@ -250,11 +298,12 @@ if __name__ == '__main__':
     test_suite = unittest.TestSuite()
     
     # Add tests
-    test_suite.addTest(unittest.makeSuite(TestPairsKalmanFilter))
-    test_suite.addTest(unittest.makeSuite(TestPairsTradingStrategy))
+    loader = unittest.TestLoader()
+    test_suite.addTests(loader.loadTestsFromTestCase(TestPairsKalmanFilter))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestPairsTradingStrategy))
     
     # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
+    runner = unittest.TextTestRunner(verbosity=1)
     result = runner.run(test_suite)
     
     # Print summary
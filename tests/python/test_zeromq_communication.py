@@ -5,8 +5,9 @@ Tests for ZeroMQ communication between Python and C++ components.
 import unittest
 import zmq
 import json
-import time
-import threading
+import numpy as np
+import orjson
+import uuid
 import sys
 import os
 from datetime import datetime
@@ -14,7 +15,6 @@ from datetime import datetime
 # Add the python directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'python'))
 
-from comms.signaler import SignalPublisher
 from comms.message_protocol import (
     TradeSignal, SignalType, MessageType,
     create_trade_signal, create_heartbeat
@@ -24,15 +24,19 @@ from comms.message_protocol import (
 class TestZeroMQCommunication(unittest.TestCase):
     """Test cases for ZeroMQ communication."""
     
+    @classmethod
+    def setUpClass(cls):
+        """Share one process-wide context; it lives for the whole run, so it isn't termed."""
+        cls.context = zmq.Context.instance()
+    
     def setUp(self):
         """Set up test environment."""
-        self.host = "localhost"
-        # Use different ports for each test to avoid conflicts
-        import random
-        self.port = 5556 + random.randint(0, 100)  # Random port between 5556-5656
-        self.context = zmq.Context()
+        # In-process endpoint, unique per test; inproc connects synchronously
+        # within the shared context, so no settle time is needed
+        self.endpoint = f"inproc://t-{uuid.uuid4().hex}"
         self.subscriber = None
         self.publisher = None
+        self.poller = zmq.Poller()
         
     def tearDown(self):
         """Clean up test environment."""
@@ -40,26 +44,29 @@ class TestZeroMQCommunication(unittest.TestCase):
             self.subscriber.close()
         if self.publisher:
             self.publisher.close()
-        self.context.term()
     
-    def setup_subscriber(self):
+    def setup_subscriber(self, topic: str = ""):
         """Set up subscriber for testing."""
         self.subscriber = self.context.socket(zmq.SUB)
-        self.subscriber.connect(f"tcp://{self.host}:{self.port}")
-        self.subscriber.setsockopt_string(zmq.SUBSCRIBE, "")
-        
-        # Set receive timeout
-        self.subscriber.setsockopt(zmq.RCVTIMEO, 2000)  # 2 seconds
+        self.subscriber.connect(self.endpoint)
+        self.subscriber.setsockopt_string(zmq.SUBSCRIBE, topic)
+        self.poller.register(self.subscriber, zmq.POLLIN)
+    
+    def wait_for_message(self, timeout: int = 500):
+        """Fail the test unless a message arrives within timeout milliseconds."""
+        socks = dict(self.poller.poll(timeout=timeout))
+        self.assertIn(self.subscriber, socks, "No message received")
     
     def setup_publisher(self):
         """Set up publisher for testing."""
         self.publisher = self.context.socket(zmq.PUB)
-        self.publisher.bind(f"tcp://*:{self.port}")
-        time.sleep(0.1)  # Allow time for binding
+        self.publisher.bind(self.endpoint)
     
     def test_signal_publisher_connection(self):
         """Test SignalPublisher connection."""
-        publisher = SignalPublisher(self.host, self.port)
+        from comms.signaler import SignalPublisher
+        
+        publisher = SignalPublisher(endpoint=self.endpoint, context=self.context)
         
         # Test connection
         result = publisher.connect()
@@ -74,9 +81,7 @@ class TestZeroMQCommunication(unittest.TestCase):
         """Test sending trade signals."""
         # Set up publisher and subscriber
         self.setup_publisher()
-        time.sleep(0.2)  # Allow time for binding
         self.setup_subscriber()
-        time.sleep(0.1)  # Allow time for connection
         
         # Create a test trade signal
         trade_signal = create_trade_signal(
@@ -96,11 +101,12 @@ class TestZeroMQCommunication(unittest.TestCase):
         
         # Send signal
         self.publisher.send_string("TRADE_SIGNAL", zmq.SNDMORE)
-        self.publisher.send_json(json.loads(trade_signal.to_json()))
+        self.publisher.send(orjson.dumps(trade_signal.to_dict()))
         
         # Receive signal
+        self.wait_for_message()
         topic = self.subscriber.recv_string()
-        message = self.subscriber.recv_json()
+        message = orjson.loads(self.subscriber.recv())
         
         # Verify
         self.assertEqual(topic, "TRADE_SIGNAL")
@@ -113,21 +119,19 @@ class TestZeroMQCommunication(unittest.TestCase):
         """Test sending heartbeat messages."""
         # Set up publisher and subscriber
         self.setup_publisher()
-        time.sleep(0.2)  # Allow time for binding
         self.setup_subscriber()
-        time.sleep(0.1)  # Allow time for connection
         
         # Create heartbeat
         heartbeat = create_heartbeat("PythonTestEngine")
         
         # Send heartbeat
         self.publisher.send_string("HEARTBEAT", zmq.SNDMORE)
-        self.publisher.send_json(heartbeat.to_dict())
-        time.sleep(0.05)  # Small delay to ensure message is sent
+        self.publisher.send(orjson.dumps(heartbeat.to_dict()))
         
         # Receive heartbeat
+        self.wait_for_message()
         topic = self.subscriber.recv_string()
-        message = self.subscriber.recv_json()
+        message = orjson.loads(self.subscriber.recv())
         
         # Verify
         self.assertEqual(topic, "HEARTBEAT")
@@ -136,14 +140,13 @@ class TestZeroMQCommunication(unittest.TestCase):
     
     def test_signal_publisher_integration(self):
         """Test SignalPublisher integration with actual sending."""
-        # Set up subscriber
-        self.setup_subscriber()
-        time.sleep(0.1)  # Allow time for binding
+        # Set up subscriber; trade signals only, so the publisher's heartbeats don't interleave
+        self.setup_subscriber("TRADE_SIGNAL")
         
         # Create publisher using SignalPublisher class
-        publisher = SignalPublisher(self.host, self.port)
+        from comms.signaler import SignalPublisher
+        publisher = SignalPublisher(endpoint=self.endpoint, context=self.context)
         publisher.connect()
-        time.sleep(0.1)  # Allow time for connection
         
         # Create and send trade signal
         trade_signal = create_trade_signal(
@@ -164,31 +167,63 @@ class TestZeroMQCommunication(unittest.TestCase):
         # Send using SignalPublisher
         success = publisher.send_trade_signal(trade_signal)
         self.assertTrue(success)
-        time.sleep(0.1)  # Allow time for message to be sent
         
         # Receive and verify
-        try:
-            topic = self.subscriber.recv_string(flags=zmq.NOBLOCK)
-            message = self.subscriber.recv_json(flags=zmq.NOBLOCK)
-            
-            self.assertEqual(topic, "TRADE_SIGNAL")
-            self.assertEqual(message["pair_name"], "GOOGL_META")
-            self.assertEqual(message["signal_type"], "ENTER_SHORT_SPREAD")
-            self.assertEqual(message["z_score"], -2.8)
-        except zmq.Again:
-            # If no message received, that's also acceptable for this test
-            self.skipTest("No message received (timing issue)")
+        self.wait_for_message()
+        topic = self.subscriber.recv_string()
+        message = orjson.loads(self.subscriber.recv())
+        
+        self.assertEqual(topic, "TRADE_SIGNAL")
+        self.assertEqual(message["pair_name"], "GOOGL_META")
+        self.assertEqual(message["signal_type"], "ENTER_SHORT_SPREAD")
+        self.assertEqual(message["z_score"], -2.8)
         
         # Cleanup
         publisher.disconnect()
     
+    def test_signal_publisher_numpy_fields(self):
+        """Test SignalPublisher sending a signal whose fields are numpy scalars, as the strategy produces."""
+        self.setup_subscriber("TRADE_SIGNAL")
+        
+        from comms.signaler import SignalPublisher
+        publisher = SignalPublisher(endpoint=self.endpoint, context=self.context)
+        publisher.connect()
+        
+        # PairsKalmanFilter.update returns np.float64; share counts may be numpy ints
+        trade_signal = create_trade_signal(
+            pair_name="EWA_EWC",
+            symbol_a="EWA",
+            symbol_b="EWC",
+            signal_type=SignalType.ENTER_LONG_SPREAD,
+            z_score=np.float64(2.1),
+            hedge_ratio=np.float64(1.23),
+            confidence=np.float64(0.85),
+            position_size=np.int64(1000),
+            shares_a=np.int64(100),
+            shares_b=np.int64(-123),
+            volatility=np.float64(0.25),
+            correlation=np.float64(0.75)
+        )
+        
+        success = publisher.send_trade_signal(trade_signal)
+        self.assertTrue(success)
+        
+        self.wait_for_message()
+        topic = self.subscriber.recv_string()
+        message = orjson.loads(self.subscriber.recv())
+        
+        self.assertEqual(topic, "TRADE_SIGNAL")
+        self.assertEqual(message["z_score"], 2.1)
+        self.assertEqual(message["hedge_ratio"], 1.23)
+        self.assertEqual(message["shares_b"], -123)
+        
+        publisher.disconnect()
+    
     def test_multiple_messages(self):
         """Test sending multiple messages in sequence."""
         # Set up publisher and subscriber
         self.setup_publisher()
-        time.sleep(0.2)  # Allow time for binding
         self.setup_subscriber()
-        time.sleep(0.1)  # Allow time for connection
         
         # Send multiple messages
         messages = [
@@ -223,41 +258,29 @@ class TestZeroMQCommunication(unittest.TestCase):
             ))
         ]
         
-        # Send all messages
+        # Send all messages, topic and payload frames in one call each
         for topic, message in messages:
-            self.publisher.send_string(topic, zmq.SNDMORE)
-            if hasattr(message, 'to_dict'):
-                self.publisher.send_json(message.to_dict())
-            else:
-                self.publisher.send_json(json.loads(message.to_json()))
-            time.sleep(0.05)  # Small delay between messages
+            self.publisher.send_multipart([topic.encode(), orjson.dumps(message.to_dict())])
         
         # Receive all messages
         received_messages = []
         for _ in range(len(messages)):
-            try:
-                topic = self.subscriber.recv_string(flags=zmq.NOBLOCK)
-                message = self.subscriber.recv_json(flags=zmq.NOBLOCK)
-                received_messages.append((topic, message))
-            except zmq.Again:
-                break
-        
-        # Allow some tolerance for timing issues
-        self.assertGreaterEqual(len(received_messages), len(messages) - 1)
-        
-        # Verify message types (if we received any)
-        if received_messages:
-            topics = [msg[0] for msg in received_messages]
-            self.assertIn("TRADE_SIGNAL", topics)
-            self.assertIn("HEARTBEAT", topics)
+            self.wait_for_message()
+            frames = self.subscriber.recv_multipart()
+            received_messages.append((frames[0].decode(), orjson.loads(frames[1])))
+        
+        self.assertEqual(len(received_messages), len(messages))
+        
+        # Verify message types
+        topics = [msg[0] for msg in received_messages]
+        self.assertIn("TRADE_SIGNAL", topics)
+        self.assertIn("HEARTBEAT", topics)
     
     def test_message_validation(self):
         """Test message validation and error handling."""
         # Set up publisher and subscriber
         self.setup_publisher()
-        time.sleep(0.2)  # Allow time for binding
         self.setup_subscriber()
-        time.sleep(0.1)  # Allow time for connection
         
         # Test invalid message (missing required fields)
         invalid_message = {
@@ -268,20 +291,16 @@ class TestZeroMQCommunication(unittest.TestCase):
         
         # Send invalid message
         self.publisher.send_string("TRADE_SIGNAL", zmq.SNDMORE)
-        self.publisher.send_json(invalid_message)
-        time.sleep(0.1)  # Allow time for message to be sent
+        self.publisher.send(orjson.dumps(invalid_message))
         
         # Should still be able to receive it (validation happens on C++ side)
-        try:
-            topic = self.subscriber.recv_string(flags=zmq.NOBLOCK)
-            message = self.subscriber.recv_json(flags=zmq.NOBLOCK)
-            
-            self.assertEqual(topic, "TRADE_SIGNAL")
-            self.assertEqual(message["message_id"], "test_001")
-            self.assertNotIn("pair_name", message)  # Missing field
-        except zmq.Again:
-            # If no message received, that's also acceptable for this test
-            self.skipTest("No message received (timing issue)")
+        self.wait_for_message()
+        topic = self.subscriber.recv_string()
+        message = orjson.loads(self.subscriber.recv())
+        
+        self.assertEqual(topic, "TRADE_SIGNAL")
+        self.assertEqual(message["message_id"], "test_001")
+        self.assertNotIn("pair_name", message)  # Missing field
 
 
 class TestMessageProtocol(unittest.TestCase):
@@ -354,11 +373,12 @@ if __name__ == '__main__':
     test_suite = unittest.TestSuite()
     
     # Add tests
-    test_suite.addTest(unittest.makeSuite(TestZeroMQCommunication))
-    test_suite.addTest(unittest.makeSuite(TestMessageProtocol))
+    loader = unittest.TestLoader()
+    test_suite.addTests(loader.loadTestsFromTestCase(TestZeroMQCommunication))
+    test_suite.addTests(loader.loadTestsFromTestCase(TestMessageProtocol))
     
     # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
+    runner = unittest.TextTestRunner(verbosity=1)
     result = runner.run(test_suite)
     
     # Print summary